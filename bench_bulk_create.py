@@ -0,0 +1,62 @@
+#! /usr/bin/env python3
+
+# compares creating posts one POST /posts/ at a time with POST /posts/bulk, in-process over ASGI,
+# for a throwaway user; prints posts/s and SQL statements per post for both
+# usage: python bench_bulk_create.py [--posts N] [--batch B]
+# bulk requests carry B posts each (at most POSTS_BULK_MAX_ITEMS)
+
+import asyncio
+import sys
+import time
+import uuid
+import httpx
+from sqlalchemy import event
+from database import async_engine
+from utils import generate_access_token
+from fixtures import seed_user, delete_user_data
+
+async def create(client: httpx.AsyncClient, headers: dict, posts: int, batch: int | None) -> float:
+    """Create posts singly (batch None) or in bulk requests of batch items; returns the elapsed seconds."""
+
+    start = time.perf_counter()
+    if batch is None:
+        for i in range(posts):
+            response = await client.post('/posts/', json={"title": f"bulk bench single {i}"}, headers=headers)
+            assert response.status_code == 200, response.text
+    else:
+        for offset in range(0, posts, batch):
+            items = [{"title": f"bulk bench bulk {i}"} for i in range(offset, min(offset + batch, posts))]
+            response = await client.post('/posts/bulk', json=items, headers=headers)
+            assert response.status_code == 200 and response.json()['failed'] == 0, response.text
+    return time.perf_counter() - start
+
+async def bench(email: str, posts: int, batch: int):
+    import main
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    headers = {"Authorization": f"Bearer {generate_access_token({'sub': email})}"}
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            await create(client, headers, 10, None)  # Warm the pool and the auth cache
+            print(f"{posts} posts, bulk requests of {batch}")
+            event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+            try:
+                for label, size in (("single", None), ("bulk", batch)):
+                    statements.clear()
+                    elapsed = await create(client, headers, posts, size)
+                    print(f"{label:>6}: {posts / elapsed:7.0f} posts/s  {len(statements) / posts:5.2f} statements/post")
+            finally:
+                event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+if __name__ == "__main__":
+    posts = int(sys.argv[sys.argv.index("--posts") + 1]) if "--posts" in sys.argv else 500
+    batch = int(sys.argv[sys.argv.index("--batch") + 1]) if "--batch" in sys.argv else 500
+    user_id = uuid.uuid4()
+    try:
+        asyncio.run(bench(seed_user(user_id, 'bulk bench'), posts, batch))
+    finally:
+        delete_user_data(user_id)
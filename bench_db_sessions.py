@@ -0,0 +1,83 @@
+#! /usr/bin/env python3
+
+# load-tests the same post-list read through a sync handler on SessionLocal (threadpool) and an
+# async handler on AsyncSessionLocal, in-process over ASGI at several concurrency levels
+# usage: python bench_db_sessions.py [--requests N] [--latency-ms MS]
+# --latency-ms adds a pg_sleep to each request to stand in for the network round trip to a remote database
+
+import asyncio
+import os
+import sys
+import time
+
+# Size each pool past the 40-thread threadpool (both stay under Postgres's default max_connections=100)
+os.environ.setdefault('DB_POOL_SIZE', '45')
+os.environ.setdefault('DB_MAX_OVERFLOW', '0')
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from database import get_db, get_async_db, engine, async_engine, User, UserRole, Post
+from utils import filter_posts
+
+CONCURRENCY = (10, 50, 200, 500)
+
+def build_app(latency: float) -> FastAPI:
+    app = FastAPI()
+    admin = User(role=UserRole.ADMIN)
+    query = filter_posts(select(Post), admin).order_by(Post.created_at.desc(), Post.id.desc()).limit(10)
+
+    @app.get('/sync')
+    def sync_posts(db: Session = Depends(get_db)):
+        if latency:
+            db.execute(text("SELECT pg_sleep(:s)"), {"s": latency})
+        return {"posts": [str(post.id) for post in db.scalars(query).all()]}
+
+    @app.get('/async')
+    async def async_posts(db: AsyncSession = Depends(get_async_db)):
+        if latency:
+            await db.execute(text("SELECT pg_sleep(:s)"), {"s": latency})
+        return {"posts": [str(post.id) for post in (await db.scalars(query)).all()]}
+
+    return app
+
+async def run(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path)
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50": timings[len(timings) // 2] * 1000,
+        "p99": timings[int(len(timings) * 0.99) - 1] * 1000
+    }
+
+async def main(requests: int, latency: float):
+    app = build_app(latency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for path in ('/sync', '/async'):
+            await run(client, path, 1000, max(CONCURRENCY))  # Open every pooled connection before measuring
+        print(f"{requests} requests per run, {latency * 1000:.0f} ms simulated database latency")
+        for concurrency in CONCURRENCY:
+            for path in ('/sync', '/async'):
+                result = await run(client, path, requests, concurrency)
+                print(f"{path[1:]:>5} c={concurrency:<4} {result['rps']:7.0f} req/s  p50 {result['p50']:7.1f} ms  p99 {result['p99']:7.1f} ms")
+    engine.dispose()
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    requests = int(sys.argv[sys.argv.index("--requests") + 1]) if "--requests" in sys.argv else 2000
+    latency = float(sys.argv[sys.argv.index("--latency-ms") + 1]) / 1000 if "--latency-ms" in sys.argv else 0.0
+    asyncio.run(main(requests, latency))
@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+
+# load-tests POST /login in-process over ASGI while a second stream of GET /posts/ runs alongside,
+# with bcrypt on the dedicated password executor and, for comparison, on the shared request threadpool
+# usage: python bench_login.py --email E --password P [--logins N] [--concurrency C]
+# the account is rehashed to BCRYPT_ROUNDS on its first login, as in production
+
+import asyncio
+import sys
+import time
+import httpx
+from starlette.concurrency import run_in_threadpool
+import main
+import routes.auth
+from utils import run_password_job, password_hash_stats, BCRYPT_ROUNDS
+
+READERS = 8
+
+async def threadpool_password_job(func, *args):
+    return await run_in_threadpool(func, *args)
+
+def percentile(timings: list, fraction: float) -> float:
+    timings = sorted(timings)
+    return timings[max(int(len(timings) * fraction) - 1, 0)] * 1000
+
+async def run(client: httpx.AsyncClient, credentials: dict, logins: int, concurrency: int) -> dict:
+    token = (await client.post('/login', json=credentials)).json()['access_token']
+    headers = {"Authorization": f"Bearer {token}"}
+    semaphore = asyncio.Semaphore(concurrency)
+    login_timings, read_timings, rejected = [], [], 0
+    done = asyncio.Event()
+
+    async def login():
+        nonlocal rejected
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post('/login', json=credentials)
+            if response.status_code == 503:
+                rejected += 1
+                return
+            assert response.status_code == 200, response.text
+            login_timings.append(time.perf_counter() - start)
+
+    async def reader():
+        while not done.is_set():
+            start = time.perf_counter()
+            response = await client.get('/posts/?limit=10', headers=headers)
+            assert response.status_code == 200, response.text
+            read_timings.append(time.perf_counter() - start)
+
+    readers = [asyncio.create_task(reader()) for _ in range(READERS)]
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*readers)
+    return {
+        "logins_per_second": len(login_timings) / elapsed,
+        "login_p50": percentile(login_timings, 0.5),
+        "login_p99": percentile(login_timings, 0.99),
+        "read_p50": percentile(read_timings, 0.5),
+        "read_p99": percentile(read_timings, 0.99),
+        "rejected": rejected
+    }
+
+async def bench(credentials: dict, logins: int, concurrency: int):
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            assert (await client.post('/login', json=credentials)).status_code == 200  # Rehash to BCRYPT_ROUNDS
+            print(f"{logins} logins, {concurrency} concurrent, {READERS} concurrent GET /posts/ readers, "
+                  f"BCRYPT_ROUNDS={BCRYPT_ROUNDS}, {password_hash_stats()['workers']} password workers")
+            for label, job in (("executor", run_password_job), ("threadpool", threadpool_password_job)):
+                routes.auth.run_password_job = job
+                result = await run(client, credentials, logins, concurrency)
+                print(f"{label:>10}: {result['logins_per_second']:6.1f} logins/s  "
+                      f"login p50 {result['login_p50']:7.1f} ms  p99 {result['login_p99']:7.1f} ms  "
+                      f"read p50 {result['read_p50']:6.1f} ms  p99 {result['read_p99']:6.1f} ms  "
+                      f"503s {result['rejected']}")
+            routes.auth.run_password_job = run_password_job
+
+if __name__ == "__main__":
+    args = sys.argv
+    credentials = {"email": args[args.index("--email") + 1], "password": args[args.index("--password") + 1]}
+    logins = int(args[args.index("--logins") + 1]) if "--logins" in args else 200
+    concurrency = int(args[args.index("--concurrency") + 1]) if "--concurrency" in args else 32
+    asyncio.run(bench(credentials, logins, concurrency))
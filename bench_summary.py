@@ -0,0 +1,125 @@
+#! /usr/bin/env python3
+
+# times the analytics summary three ways on a seeded dataset, for one user and for an admin:
+# the original four COUNTs plus a SUM, the single conditional-aggregate query over posts LEFT JOIN
+# post_analytics, and the user_analytics_rollup read the endpoint serves today
+# usage: python bench_summary.py [--posts N] [--repeats R]
+# the dataset is seeded inside a transaction that is rolled back at the end
+
+import statistics
+import sys
+import time
+import uuid
+from sqlalchemy import event, select, func, cast, text, BigInteger
+from database import SessionLocal, engine, Post, PostAnalytics, PostStatus, UserAnalyticsRollup, ROLLUP_COLUMNS, ANALYTICS_COUNTERS
+
+SEED_USERS = 100
+
+def seed(db, posts: int):
+    """Posts spread over SEED_USERS users, each with an analytics row, plus their rollup rows."""
+
+    db.execute(text("""
+        INSERT INTO users (id, name, email, password_hash, role, created_at, updated_at)
+        SELECT ('00000000-0000-4000-8000-' || lpad(to_hex(g), 12, '0'))::uuid, 'summary bench',
+               'summary-bench-' || g || '@example.invalid', 'x', 'USER', now(), now()
+        FROM generate_series(1, :users) g
+    """), {"users": SEED_USERS})
+    db.execute(text("""
+        INSERT INTO posts (id, user_id, title, status, publish_attempts, created_at, updated_at)
+        SELECT gen_random_uuid(),
+               ('00000000-0000-4000-8000-' || lpad(to_hex(1 + g % :users), 12, '0'))::uuid,
+               'summary bench ' || g,
+               (CASE WHEN g % 100 < 70 THEN 'PUBLISHED' WHEN g % 100 < 90 THEN 'DRAFT'
+                     WHEN g % 100 < 98 THEN 'SCHEDULED' ELSE 'FAILED' END)::poststatus,
+               0, now() - g * interval '1 second', now()
+        FROM generate_series(1, :posts) g
+    """), {"users": SEED_USERS, "posts": posts})
+    counters = ", ".join(ANALYTICS_COUNTERS)
+    db.execute(text(f"""
+        INSERT INTO post_analytics (id, post_id, user_id, status, {counters}, updated_at)
+        SELECT gen_random_uuid(), p.id, p.user_id, p.status, {", ".join("(random() * 100)::int" for _ in ANALYTICS_COUNTERS)}, now()
+        FROM posts p
+        WHERE p.title LIKE 'summary bench %' AND p.user_id IN (
+            SELECT id FROM users WHERE email LIKE 'summary-bench-%@example.invalid'
+        )
+    """))
+    db.execute(text(f"""
+        INSERT INTO user_analytics_rollup (user_id, total_posts, draft_posts, scheduled_posts, published_posts, failed_posts, {counters}, updated_at)
+        SELECT p.user_id, count(*), count(*) FILTER (WHERE p.status = 'DRAFT'), count(*) FILTER (WHERE p.status = 'SCHEDULED'),
+               count(*) FILTER (WHERE p.status = 'PUBLISHED'), count(*) FILTER (WHERE p.status = 'FAILED'),
+               {", ".join(f"sum(a.{counter})" for counter in ANALYTICS_COUNTERS)}, now()
+        FROM posts p JOIN post_analytics a ON a.post_id = p.id
+        WHERE p.title LIKE 'summary bench %'
+        GROUP BY p.user_id
+    """))
+    db.execute(text("ANALYZE users, posts, post_analytics, user_analytics_rollup"))
+
+def four_counts_and_sum(db, user_id: uuid.UUID | None):
+    """The summary as it was: one COUNT per status plus a SUM over the joined analytics."""
+
+    posts = select(func.count(Post.id))
+    analytics = select(*(func.sum(getattr(PostAnalytics, counter)) for counter in ANALYTICS_COUNTERS)).join(Post)
+    if user_id:
+        posts = posts.where(Post.user_id == user_id)
+        analytics = analytics.where(Post.user_id == user_id)
+    totals = [db.scalar(posts)]
+    for status in (PostStatus.PUBLISHED, PostStatus.SCHEDULED, PostStatus.DRAFT):
+        totals.append(db.scalar(posts.where(Post.status == status)))
+    return totals + list(db.execute(analytics).one())
+
+def conditional_aggregate(db, user_id: uuid.UUID | None):
+    """Status counts and counter sums in one pass over posts LEFT JOIN post_analytics."""
+
+    query = select(
+        func.count(Post.id),
+        *(func.count(Post.id).filter(Post.status == status) for status in (PostStatus.PUBLISHED, PostStatus.SCHEDULED, PostStatus.DRAFT)),
+        *(func.sum(getattr(PostAnalytics, counter)) for counter in ANALYTICS_COUNTERS)
+    ).select_from(Post).outerjoin(PostAnalytics, Post.id == PostAnalytics.post_id)
+    if user_id:
+        query = query.where(Post.user_id == user_id)
+    return list(db.execute(query).one())
+
+def rollup(db, user_id: uuid.UUID | None):
+    """What compute_analytics_summary reads: the user's rollup row, or the sum of all of them."""
+
+    if user_id:
+        return db.get(UserAnalyticsRollup, user_id, populate_existing=True)
+    return db.execute(select(
+        *(cast(func.coalesce(func.sum(getattr(UserAnalyticsRollup, column)), 0), BigInteger) for column in ROLLUP_COLUMNS)
+    )).one()
+
+def bench(posts: int, repeats: int):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        seed(db, posts)
+        print(f"seeded {posts} posts over {SEED_USERS} users in {time.perf_counter() - started:.1f} s")
+
+        event.listen(engine, "before_cursor_execute", count)
+        user_id = uuid.UUID(f"00000000-0000-4000-8000-{1:012x}")
+        for scope, scoped_user in (("user", user_id), ("admin", None)):
+            for label, summary in (("4 COUNTs + SUM", four_counts_and_sum), ("one aggregate", conditional_aggregate),
+                                   ("rollup", rollup)):
+                summary(db, scoped_user)  # Warm the cache
+                timings = []
+                for _ in range(repeats):
+                    statements.clear()
+                    start = time.perf_counter()
+                    summary(db, scoped_user)
+                    timings.append(time.perf_counter() - start)
+                print(f"{scope:>5} {label:<15} round trips {len(statements)}  "
+                      f"median {statistics.median(timings) * 1000:8.1f} ms  max {max(timings) * 1000:8.1f} ms")
+        event.remove(engine, "before_cursor_execute", count)
+    finally:
+        db.rollback()
+        db.close()
+
+if __name__ == "__main__":
+    posts = int(sys.argv[sys.argv.index("--posts") + 1]) if "--posts" in sys.argv else 1000000
+    repeats = int(sys.argv[sys.argv.index("--repeats") + 1]) if "--repeats" in sys.argv else 5
+    bench(posts, repeats)
@@ -0,0 +1,169 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class MemoryCacheBackend:
+    """Per-process response cache storage: an LRU of bodies plus invalidation generations per tag."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30.0):
+        self.entries = TTLCache(max_size=max_size, ttl=ttl)
+        # Generations live until evicted; a re-created tag gets a never-used value so old keys can't come back
+        self.generations = TTLCache(max_size=max_size * 10, ttl=float('inf'))
+        self._next_generation = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        return self.entries.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.entries.set(key, value, ttl)
+
+    def get_generations(self, tags: list) -> list:
+        with self._lock:
+            generations = []
+            for tag in tags:
+                generation = self.generations.get(tag)
+                if generation is None:
+                    generation = next(self._next_generation)
+                    self.generations.set(tag, generation)
+                generations.append(generation)
+            return generations
+
+    def bump(self, tags: list):
+        with self._lock:
+            for tag in tags:
+                self.generations.set(tag, next(self._next_generation))
+
+    def stats(self) -> dict:
+        stats = self.entries.stats()
+        return {"size": stats["size"], "max_size": stats["max_size"], "evictions": stats["evictions"]}
+
+class RedisCacheBackend:
+    """Response cache storage shared by every process, on any client with the redis-py get/set/mget/incr API."""
+
+    def __init__(self, client, prefix: str = "lia:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def get_generations(self, tags: list) -> list:
+        if not tags:
+            return []
+        values = self.client.mget([f"{self.prefix}gen:{tag}" for tag in tags])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, tags: list):
+        pipeline = self.client.pipeline(transaction=False)
+        for tag in tags:
+            pipeline.incr(f"{self.prefix}gen:{tag}")
+        pipeline.execute()
+
+    def stats(self) -> dict:
+        return {}
+
+class ResponseCache:
+    """Serialized responses keyed by (endpoint, scope, params) and invalidated by tag.
+
+    Each key embeds the current generation of its tags, so bumping a tag makes every
+    entry that depends on it unreachable without having to find and delete them.
+    """
+
+    def __init__(self, backend, ttl: float = 30.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(self, endpoint: str, scope, params: dict, tags: list) -> str:
+        generations = self.backend.get_generations(tags)
+        params = "&".join(f"{name}={params[name]}" for name in sorted(params))
+        versions = ",".join(f"{tag}@{generation}" for tag, generation in zip(tags, generations))
+        return f"resp:{endpoint}:{scope}:{params}:{versions}"
+
+    def get(self, key: str) -> bytes | None:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes):
+        self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, tags: list):
+        if tags:
+            self.invalidations += 1
+            self.backend.bump(tags)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            **self.backend.stats()
+        }
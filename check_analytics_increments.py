@@ -0,0 +1,100 @@
+#! /usr/bin/env python3
+
+# sends parallel {"inc": n} analytics PUTs for a throwaway user's posts in-process over ASGI and fails
+# unless post_analytics, today's post_analytics_daily rows and the user's rollup add up to exactly
+# what was sent; one post starts without an analytics row so the row-creating path races too
+# usage: python check_analytics_increments.py [--requests N] [--concurrency C]
+
+import asyncio
+import random
+import sys
+import uuid
+from collections import Counter
+import httpx
+from sqlalchemy import select
+from database import SessionLocal, PostAnalytics, PostAnalyticsDaily, UserAnalyticsRollup
+from utils import generate_access_token
+from fixtures import seed_user, seed_posts, seed_analytics, delete_user_data
+
+FIELDS = ('like_count', 'shares_count', 'impressions_count')
+
+async def send_increments(email: str, post_ids: list, requests: int, concurrency: int) -> dict:
+    """Fire the PUTs; returns post_id -> Counter of the amounts sent."""
+
+    import main
+
+    headers = {"Authorization": f"Bearer {generate_access_token({'sub': email})}"}
+    sent = {post_id: Counter() for post_id in post_ids}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def put(client, post_id, amounts):
+        async with semaphore:
+            response = await client.put(
+                f'/analytics/posts/{post_id}',
+                json={field: {"inc": amount} for field, amount in amounts.items()},
+                headers=headers
+            )
+        assert response.status_code == 200, response.text
+        sent[post_id].update(amounts)
+
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://check") as client:
+            await asyncio.gather(*(
+                put(client, random.choice(post_ids), {field: random.randint(1, 5) for field in random.sample(FIELDS, 2)})
+                for _ in range(requests)
+            ))
+    return sent
+
+def stored_totals(user_id: uuid.UUID, post_ids: list) -> dict:
+    """(label -> Counter) of what the database holds for the seeded posts."""
+
+    db = SessionLocal()
+    try:
+        totals = {}
+        for post_id in post_ids:
+            analytics = db.scalar(select(PostAnalytics).where(PostAnalytics.post_id == post_id))
+            totals[f"post_analytics {post_id}"] = Counter(
+                {field: getattr(analytics, field) or 0 for field in FIELDS} if analytics else {}
+            )
+            daily = Counter()
+            for row in db.scalars(select(PostAnalyticsDaily).where(PostAnalyticsDaily.post_id == post_id)):
+                daily.update({field: getattr(row, field) for field in FIELDS})
+            totals[f"post_analytics_daily {post_id}"] = daily
+        rollup = db.get(UserAnalyticsRollup, user_id)
+        totals["user_analytics_rollup"] = Counter({field: getattr(rollup, field) for field in FIELDS} if rollup else {})
+        return totals
+    finally:
+        db.close()
+
+def check_increments(requests: int, concurrency: int) -> bool:
+    user_id = uuid.uuid4()
+    try:
+        email = seed_user(user_id, 'increment check')
+        post_ids = seed_posts(user_id, 'increment check', 2)
+        # Only the first post gets its analytics row up front
+        seed_analytics(user_id, post_ids[:1])
+        sent = asyncio.run(send_increments(email, post_ids, requests, concurrency))
+        expected = {}
+        for post_id in post_ids:
+            expected[f"post_analytics {post_id}"] = sent[post_id]
+            expected[f"post_analytics_daily {post_id}"] = sent[post_id]
+        expected["user_analytics_rollup"] = sum(sent.values(), Counter())
+
+        print(f"{requests} PUTs, {concurrency} concurrent, over {len(post_ids)} posts")
+        ok = True
+        for label, have in stored_totals(user_id, post_ids).items():
+            want = expected[label]
+            drift = {field: have[field] - want[field] for field in FIELDS if have[field] != want[field]}
+            if drift:
+                ok = False
+                print(f"FAIL {label}: off by {drift}")
+            else:
+                print(f"ok   {label}: {dict(want)}")
+        return ok
+    finally:
+        delete_user_data(user_id)
+
+if __name__ == "__main__":
+    requests = int(sys.argv[sys.argv.index("--requests") + 1]) if "--requests" in sys.argv else 500
+    concurrency = int(sys.argv[sys.argv.index("--concurrency") + 1]) if "--concurrency" in sys.argv else 50
+    sys.exit(0 if check_increments(requests, concurrency) else 1)
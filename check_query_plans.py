@@ -0,0 +1,148 @@
+#! /usr/bin/env python3
+
+# seeds a throwaway dataset, EXPLAINs the main read queries and fails unless each one reads
+# posts through its intended index; everything runs in one transaction that is rolled back
+# usage: python check_query_plans.py [--posts N]
+
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func, text, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from database import SessionLocal, User, UserRole, Post, PostAnalytics, PostStatus, SEARCH_CONFIG
+from utils import filter_posts
+from scheduler import due_posts_query, upcoming_schedule_query
+
+SEED_USERS = 100
+
+class explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(explain, 'postgresql')
+def compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+def seed_user_id(n: int) -> uuid.UUID:
+    return uuid.UUID(f"00000000-0000-4000-8000-{n:012x}")
+
+def seed(db, posts: int):
+    """Posts spread over SEED_USERS users: 70% published, 20% draft, 8% scheduled (about 1% of them due), 2% failed."""
+
+    db.execute(text("""
+        INSERT INTO users (id, name, email, password_hash, role, created_at, updated_at)
+        SELECT ('00000000-0000-4000-8000-' || lpad(to_hex(g), 12, '0'))::uuid, 'plan check',
+               'plan-check-' || g || '@example.invalid', 'x', 'USER', now(), now()
+        FROM generate_series(1, :users) g
+    """), {"users": SEED_USERS})
+    db.execute(text("""
+        INSERT INTO posts (id, user_id, title, status, scheduled_at, published_at, publish_attempts, created_at, updated_at)
+        SELECT gen_random_uuid(),
+               ('00000000-0000-4000-8000-' || lpad(to_hex(1 + g % :users), 12, '0'))::uuid,
+               'post ' || g || CASE WHEN g % 1000 = 0 THEN ' needle' ELSE '' END,
+               (CASE WHEN g % 100 < 70 THEN 'PUBLISHED' WHEN g % 100 < 90 THEN 'DRAFT'
+                     WHEN g % 100 < 98 THEN 'SCHEDULED' ELSE 'FAILED' END)::poststatus,
+               CASE WHEN g % 100 BETWEEN 90 AND 97 THEN now() + (g % 5000 - 50) * interval '1 minute' END,
+               CASE WHEN g % 100 < 70 THEN now() - g * interval '1 second' END,
+               0, now() - g * interval '1 second', now()
+        FROM generate_series(1, :posts) g
+    """), {"users": SEED_USERS, "posts": posts})
+    db.execute(text("""
+        INSERT INTO post_analytics (id, post_id, user_id, status, like_count, impressions_count, updated_at)
+        SELECT gen_random_uuid(), p.id, p.user_id, p.status, 0, 0, now()
+        FROM posts p
+        WHERE p.title LIKE 'post %' AND p.user_id IN (
+            SELECT id FROM users WHERE email LIKE 'plan-check-%@example.invalid'
+        )
+    """))
+    db.execute(text("ANALYZE users, posts, post_analytics"))
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+def endpoint_queries(db) -> dict:
+    """label -> (statement, index it should use) for the post listing, search, export and scheduler reads."""
+
+    now = datetime.now(timezone.utc)
+    user = User(id=seed_user_id(1), role=UserRole.USER)
+    admin = User(id=uuid.uuid4(), role=UserRole.ADMIN)
+    newest_first = (Post.created_at.desc(), Post.id.desc())
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, 'needle')
+    rank = func.ts_rank(Post.search_vector, ts_query)
+
+    return {
+        "GET /posts (owner)": (
+            filter_posts(select(Post), user).order_by(*newest_first).limit(11),
+            'ix_posts_user_created'
+        ),
+        "GET /posts (owner, status)": (
+            filter_posts(select(Post), user, PostStatus.PUBLISHED).order_by(*newest_first).limit(11),
+            'ix_posts_user_status_created'
+        ),
+        "GET /posts (owner, cursor)": (
+            filter_posts(select(Post), user).where(
+                tuple_(Post.created_at, Post.id) < tuple_(now - timedelta(hours=12), uuid.UUID(int=0))
+            ).order_by(*newest_first).limit(11),
+            'ix_posts_user_created'
+        ),
+        "GET /posts (owner, total)": (
+            select(func.count()).select_from(filter_posts(select(Post), user).subquery()),
+            'ix_posts_user_created'
+        ),
+        "GET /posts (admin)": (
+            filter_posts(select(Post), admin).order_by(*newest_first).offset(20).limit(11),
+            'ix_posts_created'
+        ),
+        "GET /posts (admin, user_id)": (
+            filter_posts(select(Post), admin, user_id=str(user.id)).order_by(*newest_first).limit(11),
+            'ix_posts_user_created'
+        ),
+        "GET /posts/search (owner)": (
+            filter_posts(select(Post), user).add_columns(rank).where(
+                Post.search_vector.bool_op('@@')(ts_query)
+            ).order_by(rank.desc(), *newest_first).limit(11),
+            'ix_posts_search_vector'
+        ),
+        "GET /analytics/export (owner, range)": (
+            filter_posts(
+                select(Post.id, Post.title, PostAnalytics.like_count).outerjoin(PostAnalytics, PostAnalytics.post_id == Post.id),
+                user, created_from=now - timedelta(days=1), created_to=now
+            ).order_by(*newest_first),
+            'ix_posts_user_created'
+        ),
+        "scheduler due batch": (due_posts_query(db, now).statement, 'ix_posts_scheduled_due'),
+        "scheduler upcoming schedule": (upcoming_schedule_query(db, now).statement, 'ix_posts_scheduled_next_due'),
+    }
+
+def check_plans(posts: int) -> bool:
+    db = SessionLocal()
+    try:
+        seed(db, posts)
+        print(f"Seeded {posts} posts for {SEED_USERS} users")
+        ok = True
+        for label, (statement, index) in endpoint_queries(db).items():
+            plan = db.execute(explain(statement)).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = list(plan_nodes(plan[0]['Plan']))
+            seq_scans = [node for node in nodes if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') == 'posts']
+            scans = [f"{node['Node Type']} using {node['Index Name']}" for node in nodes if 'Index Name' in node]
+            if seq_scans or not any(scan.endswith(f" using {index}") for scan in scans):
+                ok = False
+                print(f"FAIL {label}: expected {index}, got {', '.join(scans) or 'Seq Scan on posts'}")
+            else:
+                print(f"ok   {label}: {', '.join(scans)}")
+        return ok
+    finally:
+        db.rollback()
+        db.close()
+
+if __name__ == "__main__":
+    posts = int(sys.argv[sys.argv.index("--posts") + 1]) if "--posts" in sys.argv else 200000
+    sys.exit(0 if check_plans(posts) else 1)
@@ -0,0 +1,94 @@
+#! /usr/bin/env python3
+
+# seeds due scheduled posts for a throwaway user, runs several scheduler workers against them at once
+# and fails unless every post was published exactly once
+# usage: python check_scheduler_claims.py [--workers N] [--posts M]
+# workers only claim the seeded user's posts, so other due posts in the database are left alone
+
+import multiprocessing
+import sys
+import uuid
+from collections import Counter
+from sqlalchemy import text
+from database import SessionLocal, Post, PostStatus
+from fixtures import seed_user, seed_posts, seed_analytics, delete_user_data
+
+BATCH_SIZE = 7  # Small batches so the workers interleave many claims
+PUBLISH_LATENCY = 0.01
+
+def worker(user_id: uuid.UUID, start, results):
+    """Publish due posts of user_id with the real claim query until none are left; reports the ids it published."""
+
+    import asyncio
+    import scheduler
+    from publisher import Publisher
+
+    published = []
+
+    class RecordingPublisher(Publisher):
+        async def publish(self, post) -> None:
+            await asyncio.sleep(PUBLISH_LATENCY)
+            published.append(post.id)
+
+    due_posts_query = scheduler.due_posts_query
+
+    def own_due_posts(db, current_time, skipped=frozenset()):
+        # Same claim query, narrowed to the seeded user after its LIMIT/FOR UPDATE are in place
+        return due_posts_query(db, current_time, skipped).enable_assertions(False).filter(Post.user_id == user_id)
+
+    scheduler.publisher = RecordingPublisher()
+    scheduler.due_posts_query = own_due_posts
+    scheduler.PUBLISH_BATCH_SIZE = BATCH_SIZE
+
+    start.wait()
+    while True:
+        published_before = len(published)
+        scheduler.find_and_publish_posts()
+        if len(published) == published_before:
+            break
+    results.put([str(post_id) for post_id in published])
+
+def check_claims(workers: int, posts: int) -> bool:
+    user_id = uuid.uuid4()
+    try:
+        seed_user(user_id, 'claim check')
+        seed_analytics(user_id, seed_posts(user_id, 'claim check', posts, PostStatus.SCHEDULED), PostStatus.SCHEDULED)
+        context = multiprocessing.get_context('spawn')
+        start, results = context.Event(), context.Queue()
+        processes = [context.Process(target=worker, args=(user_id, start, results)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        start.set()
+        per_worker = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        counts = Counter(post_id for published in per_worker for post_id in published)
+        db = SessionLocal()
+        try:
+            rows = db.execute(text(
+                "SELECT id::text, status::text, publish_attempts FROM posts WHERE user_id = :user_id"
+            ), {"user_id": user_id}).all()
+        finally:
+            db.close()
+
+        print(f"{posts} posts, {workers} workers, published per worker: {[len(published) for published in per_worker]}")
+        ok = True
+        duplicates = [post_id for post_id, count in counts.items() if count > 1]
+        missing = [row.id for row in rows if counts[row.id] == 0]
+        unfinished = [row.id for row in rows if row.status != 'PUBLISHED' or row.publish_attempts != 1]
+        for label, post_ids in (("published more than once", duplicates), ("never published", missing),
+                                ("not PUBLISHED after one attempt", unfinished)):
+            if post_ids:
+                ok = False
+                print(f"FAIL {len(post_ids)} posts {label}, e.g. {post_ids[:3]}")
+        if ok:
+            print("ok   every post was published exactly once")
+        return ok
+    finally:
+        delete_user_data(user_id)
+
+if __name__ == "__main__":
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else 4
+    posts = int(sys.argv[sys.argv.index("--posts") + 1]) if "--posts" in sys.argv else 500
+    sys.exit(0 if check_claims(workers, posts) else 1)
@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+
+# counts the SQL statements each analytics endpoint sends (before_cursor_execute on the async engine)
+# for a throwaway user's post and fails if any endpoint needs more or fewer than expected
+# usage: python check_statement_counts.py
+
+import sys
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from database import async_engine
+from utils import generate_access_token
+from fixtures import seed_user, seed_posts, seed_analytics, delete_user_data
+
+def endpoint_requests(post_id: uuid.UUID, bare_post_id: uuid.UUID) -> dict:
+    """label -> (method, path, json body, expected statements), run in this order."""
+
+    return {
+        "GET /analytics/posts/{id}": ("GET", f"/analytics/posts/{post_id}", None, 1),
+        "GET /analytics/posts/{id} (no analytics row)": ("GET", f"/analytics/posts/{bare_post_id}", None, 1),
+        "GET /analytics/posts/{id}/graph": ("GET", f"/analytics/posts/{post_id}/graph?days=30", None, 1),
+        "PUT /analytics/posts/{id} (absolute)": ("PUT", f"/analytics/posts/{post_id}", {"like_count": 3}, 5),
+        "PUT /analytics/posts/{id} (increment)": ("PUT", f"/analytics/posts/{post_id}", {"like_count": {"inc": 1}}, 3),
+    }
+
+def check_counts() -> bool:
+    import main
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split(None, 1)[0])
+
+    user_id = uuid.uuid4()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        # One post with an analytics row and one without (seeded on the sync engine, so not counted)
+        email = seed_user(user_id, 'statement check')
+        post_id, bare_post_id = seed_posts(user_id, 'statement check', 2)
+        seed_analytics(user_id, [post_id])
+        headers = {"Authorization": f"Bearer {generate_access_token({'sub': email})}"}
+        with TestClient(main.app) as client:
+            # Load the user into the auth cache so only the endpoints' own statements are counted
+            assert client.get('/analytics/summary', headers=headers).status_code == 200
+            ok = True
+            for label, (method, path, body, expected) in endpoint_requests(post_id, bare_post_id).items():
+                statements.clear()
+                response = client.request(method, path, json=body, headers=headers)
+                assert response.status_code == 200, (label, response.status_code, response.text)
+                if len(statements) != expected:
+                    ok = False
+                    print(f"FAIL {label}: {len(statements)} statements, expected {expected} ({', '.join(statements)})")
+                else:
+                    print(f"ok   {label}: {', '.join(statements)}")
+        return ok
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+        delete_user_data(user_id)
+
+if __name__ == "__main__":
+    sys.exit(0 if check_counts() else 1)
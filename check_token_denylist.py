@@ -0,0 +1,119 @@
+#! /usr/bin/env python3
+
+# checks the refresh token denylist against the database for a throwaway user: logout then refresh is
+# refused, a logout made by another API process is refused here within one sync interval, load()
+# rebuilds the list from refresh_tokens.revoked_at, and expired entries are pruned
+# usage: python check_token_denylist.py [--sync-seconds S]
+
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from jose import jwt
+from sqlalchemy import text
+from database import SessionLocal
+from utils import hash_password
+from token_denylist import TokenDenylist
+from fixtures import seed_user, delete_user_data
+
+PASSWORD = 'denylist-check'
+
+def jti_of(token: str) -> str:
+    return jwt.get_unverified_claims(token)['jti']
+
+def other_process(refresh_token: str, sync_seconds: float, ready, logged_out, results):
+    """A second API process: reports how long after the logout its /refresh starts answering 401."""
+
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        status = client.post('/refresh', json={"refresh_token": refresh_token}).status_code
+        ready.set()
+        logged_out.wait()
+        started = time.monotonic()
+        deadline = started + 3 * sync_seconds
+        while status == 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            status = client.post('/refresh', json={"refresh_token": refresh_token}).status_code
+        results.put((status, time.monotonic() - started))
+
+def check_denylist(sync_seconds: float) -> bool:
+    from fastapi.testclient import TestClient
+    import main
+
+    user_id = uuid.uuid4()
+    checks = {}
+    try:
+        email = seed_user(user_id, 'denylist check', hash_password(PASSWORD))
+        with TestClient(main.app) as client:
+            def login():
+                response = client.post('/login', json={"email": email, "password": PASSWORD})
+                assert response.status_code == 200, response.text
+                return response.json()['refresh_token']
+
+            def refresh_status(token):
+                return client.post('/refresh', json={"refresh_token": token}).status_code
+
+            tokens = [login() for _ in range(4)]
+
+            # Logout then refresh, in the same process
+            client.post('/logout', json={"refresh_token": tokens[0]})
+            checks["logout then refresh is refused"] = (
+                refresh_status(tokens[0]) == 401 and refresh_status(tokens[1]) == 200
+            )
+
+            # Logout here, refresh on another process
+            # Spawned processes import token_denylist afresh, so they pick the interval up from the environment
+            os.environ['TOKEN_DENYLIST_SYNC_SECONDS'] = str(sync_seconds)
+            context = multiprocessing.get_context('spawn')
+            ready, logged_out, results = context.Event(), context.Event(), context.Queue()
+            process = context.Process(target=other_process, args=(tokens[1], sync_seconds, ready, logged_out, results))
+            process.start()
+            ready.wait()
+            client.post('/logout', json={"refresh_token": tokens[1]})
+            logged_out.set()
+            status, elapsed = results.get()
+            process.join()
+            checks[f"other process refuses within one sync interval ({elapsed:.2f}s of {sync_seconds:g}s)"] = (
+                status == 401 and elapsed <= sync_seconds + 0.5
+            )
+
+        # Startup rebuild: revoked tokens come back, active ones don't
+        rebuilt = TokenDenylist()
+        rebuilt.load()
+        checks["load() rebuilds from revoked_at"] = (
+            rebuilt.is_revoked(jti_of(tokens[0])) and rebuilt.is_revoked(jti_of(tokens[1]))
+            and not rebuilt.is_revoked(jti_of(tokens[2]))
+        )
+
+        # Entries are dropped once their token expires, both in memory and on the next rebuild
+        rebuilt.revoke(jti_of(tokens[3]), datetime.now(timezone.utc) + timedelta(seconds=1))
+        revoked_before = rebuilt.is_revoked(jti_of(tokens[3]))
+        time.sleep(1.1)
+        rebuilt.sync()
+        db = SessionLocal()
+        try:
+            db.execute(text(
+                "UPDATE refresh_tokens SET expires_at = now() - interval '1 minute' WHERE jti = :jti"
+            ), {"jti": jti_of(tokens[0])})
+            db.commit()
+        finally:
+            db.close()
+        rebuilt.load()
+        checks["expired entries are pruned"] = (
+            revoked_before and not rebuilt.is_revoked(jti_of(tokens[3]))
+            and not rebuilt.is_revoked(jti_of(tokens[0])) and rebuilt.is_revoked(jti_of(tokens[1]))
+        )
+    finally:
+        delete_user_data(user_id)
+
+    for label, passed in checks.items():
+        print(f"{'ok  ' if passed else 'FAIL'} {label}")
+    return all(checks.values())
+
+if __name__ == "__main__":
+    sync_seconds = float(sys.argv[sys.argv.index("--sync-seconds") + 1]) if "--sync-seconds" in sys.argv else 1.0
+    sys.exit(0 if check_denylist(sync_seconds) else 1)
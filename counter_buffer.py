@@ -0,0 +1,260 @@
+import fcntl
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import SessionLocal, Post, PostAnalytics
+from utils import record_daily_analytics_batch, apply_rollup_deltas, invalidate_analytics_cache
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv('COUNTER_BUFFER_FLUSH_SECONDS', '1.0'))
+# Flush early once this many events are pending
+FLUSH_THRESHOLD = int(os.getenv('COUNTER_BUFFER_FLUSH_THRESHOLD', '10000'))
+# Base path of the append-only logs of buffered events; each process writes <base>.<pid>
+WAL_PATH = os.getenv('COUNTER_BUFFER_WAL')
+
+class CounterBuffer:
+    """Write-behind buffer for analytics increments.
+
+    Increments are folded per post and counter in memory and written by a background
+    thread as one batched upsert, so a hot post costs one row update per flush instead of
+    one per event. Up to one flush interval of events is lost on a crash unless a WAL
+    base path is configured. Each process then logs to its own <base>.<pid> file and holds
+    a lock on <base>.<pid>.lock while it runs; at startup the WALs of every process whose
+    lock is free are replayed (at-least-once: a crash between a flush's commit and the WAL
+    cleanup applies that batch twice).
+    """
+
+    def __init__(self, flush_interval: float = 1.0, flush_threshold: int = 10000, wal_base: str | None = None):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.wal_base = wal_base
+        self.wal_path = None
+        self._wal_lock = None
+        self._pending = {}  # post_id -> Counter of increments
+        self._pending_events = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One flush at a time
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._wal = None
+        self.flushes = 0
+        self.flush_errors = 0
+        self.flushed_events = 0
+        self.dropped_posts = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        if self.wal_base:
+            # The pid is taken at start, so forked workers don't share their parent's file
+            self.wal_path = f"{self.wal_base}.{os.getpid()}"
+            self._wal_lock = open(f"{self.wal_path}.lock", 'a')
+            fcntl.flock(self._wal_lock, fcntl.LOCK_EX)
+            self._replay_wal()
+            self._wal = open(self.wal_path, 'a')
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="counter-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write out everything still buffered."""
+
+        self._stopping.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        if self._wal:
+            self._wal.close()
+            self._wal = None
+            os.remove(f"{self.wal_path}.lock")
+            self._wal_lock.close()
+            self._wal_lock = None
+
+    def add(self, post_id: uuid.UUID, increments: dict):
+        increments = {field: amount for field, amount in increments.items() if amount}
+        if not increments:
+            return
+        with self._lock:
+            self._pending.setdefault(post_id, Counter()).update(increments)
+            self._pending_events += 1
+            if self._wal:
+                self._wal.write(json.dumps({"post_id": str(post_id), **increments}) + "\n")
+                self._wal.flush()
+            if self._pending_events >= self.flush_threshold:
+                self._wake.set()
+
+    def flush(self):
+        """Write the buffered increments in one transaction; on failure they are put back."""
+
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, events = self._pending, self._pending_events
+                self._pending, self._pending_events = {}, 0
+                flushing_path = self._rotate_wal()
+
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                owners = self._write(batch, db)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self.flush_errors += 1
+                print(f"Error flushing counter buffer: {e}")
+                with self._lock:
+                    for post_id, increments in batch.items():
+                        self._pending.setdefault(post_id, Counter()).update(increments)
+                        if self._wal:
+                            self._wal.write(json.dumps({"post_id": str(post_id), **increments}) + "\n")
+                    self._pending_events += events
+                    if self._wal:
+                        self._wal.flush()
+                return
+            finally:
+                db.close()
+                if flushing_path:
+                    os.remove(flushing_path)
+
+            invalidate_analytics_cache(owners, batch)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.flushed_events += events
+            self.last_flush_ms = round(elapsed_ms, 3)
+            self.max_flush_ms = round(max(self.max_flush_ms, elapsed_ms), 3)
+            self._total_flush_ms += elapsed_ms
+
+    def _write(self, batch: dict, db) -> set:
+        """Apply a batch (caller commits); returns the owners touched."""
+
+        # Owners and statuses for the rollups and new analytics rows; deleted posts drop out here
+        posts = {
+            row.id: row
+            for row in db.query(Post.id, Post.user_id, Post.status).filter(Post.id.in_(batch)).all()
+        }
+        self.dropped_posts += len(batch) - len(posts)
+        if not posts:
+            return set()
+
+        fields = sorted({field for post_id in posts for field in batch[post_id]})
+        values = [
+            {
+                'post_id': post_id,
+                'user_id': posts[post_id].user_id,
+                'status': posts[post_id].status,
+                **{field: batch[post_id].get(field, 0) for field in fields}
+            }
+            for post_id in sorted(posts)
+        ]
+        stmt = pg_insert(PostAnalytics).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PostAnalytics.post_id],
+            set_={
+                **{field: func.coalesce(getattr(PostAnalytics, field), 0) + stmt.excluded[field] for field in fields},
+                'updated_at': func.now()
+            }
+        )
+        db.execute(stmt)
+
+        record_daily_analytics_batch({post_id: batch[post_id] for post_id in posts}, db)
+        rollup_deltas = {}
+        for post_id, post in posts.items():
+            rollup_deltas.setdefault(post.user_id, Counter()).update(batch[post_id])
+        apply_rollup_deltas(rollup_deltas, db)
+        return set(rollup_deltas)
+
+    def _rotate_wal(self) -> str | None:
+        """Move the current WAL aside for the flush in progress (called with the lock held)."""
+
+        if not self._wal:
+            return None
+        self._wal.close()
+        flushing_path = f"{self.wal_path}.flushing"
+        os.replace(self.wal_path, flushing_path)
+        self._wal = open(self.wal_path, 'a')
+        return flushing_path
+
+    def _replay_wal(self):
+        """Take over the WALs of this process's pid and of every process that is no longer running."""
+
+        pattern = re.compile(re.escape(os.path.basename(self.wal_base)) + r"\.(\d+)(\.flushing|\.lock)?$")
+        prefixes = sorted({
+            path[:len(path) - len(match.group(2) or '')]
+            for path in glob.glob(f"{glob.escape(self.wal_base)}.*")
+            if (match := pattern.match(os.path.basename(path)))
+        })
+        replayed = 0
+        taken = []  # (files to remove, lock held on them)
+        for prefix in prefixes:
+            lock = self._wal_lock
+            if prefix != self.wal_path:
+                # A running process holds its lock, so its files are left alone
+                lock = open(f"{prefix}.lock", 'a')
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock.close()
+                    continue
+            files = [path for path in (f"{prefix}.flushing", prefix) if os.path.exists(path)]
+            for path in files:
+                with open(path) as wal:
+                    for line in wal:
+                        try:
+                            event = json.loads(line)
+                            post_id = uuid.UUID(event.pop("post_id"))
+                        except (ValueError, KeyError):
+                            continue  # Torn last line from a crash
+                        self._pending.setdefault(post_id, Counter()).update(event)
+                        self._pending_events += 1
+                        replayed += 1
+            if prefix != self.wal_path:
+                files.append(f"{prefix}.lock")
+            taken.append((files, lock))
+
+        if replayed:
+            print(f"Replaying {replayed} buffered counter events into {self.wal_path}")
+        # Persist them before the old files go away (this also drops a torn last line of our own WAL)
+        with open(self.wal_path, 'w') as wal:
+            for post_id, increments in self._pending.items():
+                wal.write(json.dumps({"post_id": str(post_id), **increments}) + "\n")
+        for files, lock in taken:
+            for path in files:
+                if path != self.wal_path:
+                    os.remove(path)
+            if lock is not self._wal_lock:
+                lock.close()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending_posts = len(self._pending)
+            pending_events = self._pending_events
+        return {
+            "pending_posts": pending_posts,
+            "pending_events": pending_events,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "flushed_events": self.flushed_events,
+            "dropped_posts": self.dropped_posts,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0
+        }
+
+counter_buffer = CounterBuffer(FLUSH_INTERVAL_SECONDS, FLUSH_THRESHOLD, WAL_PATH)
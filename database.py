@@ -1,22 +1,31 @@
 import enum
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, deferred
 from sqlalchemy import ( 
     Column, 
     Integer, 
+    BigInteger, 
     String, 
     Enum, 
     DateTime, 
+    Date, 
     ForeignKey, 
     Text, 
     create_engine, 
     func, 
-    Boolean 
+    Boolean, 
+    Computed, 
+    Index 
 )
 from datetime import datetime, timezone, timedelta
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from dotenv import load_dotenv
 import os
-from sqlalchemy.dialects.postgresql import UUID
+import time
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 import uuid
 
 # DATABASE MODELS
@@ -41,35 +50,69 @@ class User(Base):
     email = Column(String(100), unique=True, nullable=False, index=True)
     password_hash = Column(String(128), nullable=False)
     role = Column(Enum(UserRole), nullable=False, default=UserRole.USER, index=True)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc), index=True)
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc), index=True)
+    updated_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc), onupdate=func.now())
 
     posts = relationship("Post", back_populates="user")
     refresh_tokens = relationship("RefreshToken", back_populates="user")
 
+# Full-text search document: title terms (weight A) rank above content terms (weight B)
+SEARCH_CONFIG = 'english'
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')"
+)
+
 # In your database.py, fix the foreign key types:
 
 class Post(Base):
     __tablename__ = 'posts'
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False, index=True)  # Changed from Integer
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)  # Changed from Integer
     title = Column(String(200), nullable=False)
     content = Column(Text)
-    status = Column(Enum(PostStatus), default=PostStatus.DRAFT, index=True)
-    scheduled_at = Column(DateTime, index=True)
-    published_at = Column(DateTime, index=True)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc), index=True)
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=func.now())
+    status = Column(Enum(PostStatus), default=PostStatus.DRAFT)
+    scheduled_at = Column(DateTime(timezone=True))
+    published_at = Column(DateTime(timezone=True))
+    publish_attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    next_attempt_at = Column(DateTime(timezone=True))  # Set while a failed publish waits for its retry
+    last_publish_error = Column(Text)
+    # Lease of the scheduler worker publishing the post; expired leases can be claimed again
+    claimed_by = Column(String(100))
+    claimed_until = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=func.now())
+    # Maintained by Postgres; deferred so regular post loads don't carry it
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
 
     user = relationship("User", back_populates="posts")
     analytics = relationship("PostAnalytics", back_populates="post", uselist=False, cascade="all, delete-orphan")
 
+# Post indexes follow the query shapes: listings by owner (optionally by status) newest first,
+# the admin listing, and the scheduler's due/upcoming scans, which only ever look at scheduled posts
+Index('ix_posts_user_created', Post.user_id, Post.created_at.desc(), Post.id.desc())
+Index('ix_posts_user_status_created', Post.user_id, Post.status, Post.created_at.desc(), Post.id.desc())
+Index('ix_posts_created', Post.created_at.desc(), Post.id.desc())
+Index('ix_posts_scheduled_due', Post.scheduled_at, postgresql_where=Post.status == PostStatus.SCHEDULED)
+Index('ix_posts_scheduled_next_due', func.coalesce(Post.next_attempt_at, Post.scheduled_at),
+      postgresql_where=Post.status == PostStatus.SCHEDULED)
+Index('ix_posts_search_vector', Post.search_vector, postgresql_using='gin')
+
+# Stored engagement scores, kept by Postgres so top-N queries can read them from an index
+TOTAL_REACTIONS_SQL = (
+    "coalesce(like_count, 0) + coalesce(praise_count, 0) + coalesce(empathy_count, 0) + "
+    "coalesce(interest_count, 0) + coalesce(appreciation_count, 0)"
+)
+TOTAL_ENGAGEMENTS_SQL = f"{TOTAL_REACTIONS_SQL} + coalesce(shares_count, 0) + coalesce(comments_count, 0)"
+
 class PostAnalytics(Base):
     __tablename__ = 'post_analytics'
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     post_id = Column(UUID(as_uuid=True), ForeignKey('posts.id'), nullable=False, index=True, unique=True)  # Changed from Integer
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'))  # Copy of posts.user_id for the top-N indexes
+    status = Column(Enum(PostStatus))  # Copy of posts.status for the top-N indexes
     like_count = Column(Integer, default=0)
     praise_count = Column(Integer, default=0)
     empathy_count = Column(Integer, default=0)
@@ -78,27 +121,89 @@ class PostAnalytics(Base):
     impressions_count = Column(Integer, default=0)
     shares_count = Column(Integer, default=0)
     comments_count = Column(Integer, default=0)
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=func.now())
+    total_reactions = Column(Integer, Computed(TOTAL_REACTIONS_SQL, persisted=True))
+    total_engagements = Column(Integer, Computed(TOTAL_ENGAGEMENTS_SQL, persisted=True))
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=func.now())
 
     post = relationship("Post", back_populates="analytics")
 
+# Top-N indexes for get_top_posts, per user and admin-wide
+Index('ix_post_analytics_user_status_engagements', PostAnalytics.user_id, PostAnalytics.status, PostAnalytics.total_engagements.desc())
+Index('ix_post_analytics_user_status_reactions', PostAnalytics.user_id, PostAnalytics.status, PostAnalytics.total_reactions.desc())
+Index('ix_post_analytics_user_status_impressions', PostAnalytics.user_id, PostAnalytics.status, PostAnalytics.impressions_count.desc())
+Index('ix_post_analytics_status_engagements', PostAnalytics.status, PostAnalytics.total_engagements.desc())
+Index('ix_post_analytics_status_reactions', PostAnalytics.status, PostAnalytics.total_reactions.desc())
+Index('ix_post_analytics_status_impressions', PostAnalytics.status, PostAnalytics.impressions_count.desc())
+
+class PostAnalyticsDaily(Base):
+    __tablename__ = 'post_analytics_daily'
+
+    # (post_id, day) primary key keeps each post's history contiguous in the index for range scans
+    post_id = Column(UUID(as_uuid=True), ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    like_count = Column(Integer, nullable=False, default=0)
+    praise_count = Column(Integer, nullable=False, default=0)
+    empathy_count = Column(Integer, nullable=False, default=0)
+    interest_count = Column(Integer, nullable=False, default=0)
+    appreciation_count = Column(Integer, nullable=False, default=0)
+    impressions_count = Column(Integer, nullable=False, default=0)
+    shares_count = Column(Integer, nullable=False, default=0)
+    comments_count = Column(Integer, nullable=False, default=0)
+
     @hybrid_property
     def total_reactions(self):
         return (
-            (self.like_count or 0) +
-            (self.praise_count or 0) +
-            (self.empathy_count or 0) +
-            (self.interest_count or 0) +
-            (self.appreciation_count or 0)
+            self.like_count +
+            self.praise_count +
+            self.empathy_count +
+            self.interest_count +
+            self.appreciation_count
         )
 
     @hybrid_property
     def total_engagements(self):
-        return (
-            self.total_reactions +
-            (self.shares_count or 0) +
-            (self.comments_count or 0)
-        )
+        return self.total_reactions + self.shares_count + self.comments_count
+
+# Counter columns shared by PostAnalytics and PostAnalyticsDaily
+ANALYTICS_COUNTERS = (
+    'like_count',
+    'praise_count',
+    'empathy_count',
+    'interest_count',
+    'appreciation_count',
+    'impressions_count',
+    'shares_count',
+    'comments_count',
+)
+
+class UserAnalyticsRollup(Base):
+    __tablename__ = 'user_analytics_rollup'
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    total_posts = Column(Integer, nullable=False, default=0)
+    draft_posts = Column(Integer, nullable=False, default=0)
+    scheduled_posts = Column(Integer, nullable=False, default=0)
+    published_posts = Column(Integer, nullable=False, default=0)
+    failed_posts = Column(Integer, nullable=False, default=0)
+    like_count = Column(BigInteger, nullable=False, default=0)
+    praise_count = Column(BigInteger, nullable=False, default=0)
+    empathy_count = Column(BigInteger, nullable=False, default=0)
+    interest_count = Column(BigInteger, nullable=False, default=0)
+    appreciation_count = Column(BigInteger, nullable=False, default=0)
+    impressions_count = Column(BigInteger, nullable=False, default=0)
+    shares_count = Column(BigInteger, nullable=False, default=0)
+    comments_count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+# Rollup column counting posts in each status
+ROLLUP_STATUS_COLUMNS = {
+    PostStatus.DRAFT: 'draft_posts',
+    PostStatus.SCHEDULED: 'scheduled_posts',
+    PostStatus.PUBLISHED: 'published_posts',
+    PostStatus.FAILED: 'failed_posts',
+}
+
+ROLLUP_COLUMNS = ('total_posts', *ROLLUP_STATUS_COLUMNS.values(), *ANALYTICS_COUNTERS)
 
 class RefreshToken(Base):
     __tablename__ = 'refresh_tokens'
@@ -107,18 +212,110 @@ class RefreshToken(Base):
     jti = Column(String, unique=True, index=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'))  # Changed from Integer
     is_active = Column(Boolean, default=True)
-    expires_at = Column(DateTime, default=datetime.now(timezone.utc) + timedelta(days=7))
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    revoked_at = Column(DateTime(timezone=True))  # Set with is_active=False; the denylist syncs on it
+    expires_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc) + timedelta(days=7))  # Login sets the JWT's exp
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     user = relationship("User", back_populates="refresh_tokens")
+
+# Per-user active token cap at login, the expiry sweep, and the denylist's incremental sync
+Index('ix_refresh_tokens_user_created', RefreshToken.user_id, RefreshToken.created_at)
+Index('ix_refresh_tokens_expires_at', RefreshToken.expires_at)
+Index('ix_refresh_tokens_revoked_at', RefreshToken.revoked_at, postgresql_where=RefreshToken.revoked_at.is_not(None))
     
-# DEPENDENCY INJECTION FUNCTION
+# ENGINE CONFIGURATION
 
 load_dotenv()
 
 DB_URL = os.getenv('DB_URL')
 
-engine = create_engine(DB_URL)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# PgBouncer (transaction pooling) mode: no client-side pool and no prepared statements.
+# Startup parameters are not forwarded by PgBouncer, so set statement_timeout on the role instead.
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'false').lower() == 'true'
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))
+
+class _TimedPoolMixin:
+    """Records how long callers wait to get a connection out of the pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = {"checkouts": 0, "timeouts": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+    def connect(self):
+        stats = self.wait_stats
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            stats["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            stats["checkouts"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _engine_options(async_driver: bool) -> dict:
+    if DB_PGBOUNCER:
+        options = {"poolclass": NullPool}
+    else:
+        options = {
+            "poolclass": TimedAsyncQueuePool if async_driver else TimedQueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        }
+
+    connect_args = {}
+    if async_driver:
+        if DB_PGBOUNCER:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+        elif DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    elif DB_STATEMENT_TIMEOUT_MS and not DB_PGBOUNCER:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+    options["connect_args"] = connect_args
+    return options
+
+def pool_stats(engine) -> dict:
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    wait_stats = getattr(pool, 'wait_stats', None)
+    if wait_stats:
+        stats.update({
+            "checkouts": wait_stats["checkouts"],
+            "timeouts": wait_stats["timeouts"],
+            "avg_wait_ms": round(wait_stats["total_wait"] / wait_stats["checkouts"] * 1000, 3),
+            "max_wait_ms": round(wait_stats["max_wait"] * 1000, 3),
+        })
+    return stats
+
+# DEPENDENCY INJECTION FUNCTION
+
+# Sync engine, used by the scheduler and maintenance scripts
+engine = create_engine(DB_URL, **_engine_options(async_driver=False))
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
@@ -127,4 +324,16 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async engine, used by the API route handlers (defaults to DB_URL on the asyncpg driver)
+ASYNC_DB_URL = os.getenv('ASYNC_DB_URL') or make_url(DB_URL).set(drivername='postgresql+asyncpg')
+
+async_engine = create_async_engine(ASYNC_DB_URL, **_engine_options(async_driver=True))
+
+# expire_on_commit=False: attribute access after commit must not trigger implicit (sync) IO
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
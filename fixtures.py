@@ -0,0 +1,66 @@
+# throwaway users and posts for the check_*.py scripts, written straight to the database;
+# delete_user_data removes everything a check seeded (or created through the API) for its user
+
+import uuid
+from sqlalchemy import text
+from database import SessionLocal, PostStatus, PostAnalytics, ANALYTICS_COUNTERS
+
+def seed_user(user_id: uuid.UUID, label: str, password_hash: str = 'x') -> str:
+    """Insert a USER account named after the check; returns its email."""
+
+    email = f"{label.replace(' ', '-')}-{user_id}@example.com"
+    db = SessionLocal()
+    try:
+        db.execute(text("""
+            INSERT INTO users (id, name, email, password_hash, role, created_at, updated_at)
+            VALUES (:user_id, :name, :email, :password_hash, 'USER', now(), now())
+        """), {"user_id": user_id, "name": label, "email": email, "password_hash": password_hash})
+        db.commit()
+    finally:
+        db.close()
+    return email
+
+def seed_posts(user_id: uuid.UUID, label: str, posts: int, status: PostStatus = PostStatus.PUBLISHED) -> list:
+    """Insert posts for the user; SCHEDULED ones are already due, a millisecond apart. Returns their ids."""
+
+    db = SessionLocal()
+    try:
+        post_ids = db.scalars(text("""
+            INSERT INTO posts (id, user_id, title, status, scheduled_at, publish_attempts, created_at, updated_at)
+            SELECT gen_random_uuid(), :user_id, :title || ' ' || g, CAST(:status AS poststatus),
+                   CASE WHEN :status = 'SCHEDULED' THEN now() - g * interval '1 millisecond' END, 0, now(), now()
+            FROM generate_series(1, :posts) g
+            RETURNING id
+        """), {"user_id": user_id, "title": label, "status": status.name, "posts": posts}).all()
+        db.commit()
+    finally:
+        db.close()
+    return post_ids
+
+def seed_analytics(user_id: uuid.UUID, post_ids: list, status: PostStatus = PostStatus.PUBLISHED):
+    """Give each post an analytics row with every counter at zero."""
+
+    db = SessionLocal()
+    try:
+        db.add_all(
+            PostAnalytics(post_id=post_id, user_id=user_id, status=status, **dict.fromkeys(ANALYTICS_COUNTERS, 0))
+            for post_id in post_ids
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def delete_user_data(user_id: uuid.UUID):
+    db = SessionLocal()
+    try:
+        for statement in (
+            "DELETE FROM refresh_tokens WHERE user_id = :user_id",
+            "DELETE FROM post_analytics WHERE user_id = :user_id",
+            "DELETE FROM posts WHERE user_id = :user_id",
+            "DELETE FROM user_analytics_rollup WHERE user_id = :user_id",
+            "DELETE FROM users WHERE id = :user_id",
+        ):
+            db.execute(text(statement), {"user_id": user_id})
+        db.commit()
+    finally:
+        db.close()
@@ -1,16 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routes import auth, posts, analytics
+from utils import user_cache, response_cache, password_hash_stats
+from database import async_engine, pool_stats
+from counter_buffer import counter_buffer
+from token_denylist import token_denylist
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    counter_buffer.start()
+    # Refreshes are checked against this in memory, so it is rebuilt before serving
+    token_denylist.start()
+    yield
+    token_denylist.stop()
+    # Write out buffered analytics events before exiting
+    await asyncio.to_thread(counter_buffer.stop)
 
 app = FastAPI(
     title="LinkedIn Analytics Backend",
     description="A simplified LinkedIn analytics platform backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 @app.get('/health')
 def health_check():
     return {"detail": "working"}
 
+@app.get('/health/stats')
+def health_stats():
+    return {
+        "user_cache": user_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "password_hashing": password_hash_stats(),
+        "db_pool": pool_stats(async_engine.sync_engine),
+        "counter_buffer": counter_buffer.stats(),
+        "token_denylist": token_denylist.stats()
+    }
+
 app.include_router(auth.router, tags=["Authentication"])
 app.include_router(posts.router, prefix="/posts", tags=["Posts"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
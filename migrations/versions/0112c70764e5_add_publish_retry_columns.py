@@ -0,0 +1,32 @@
+"""add publish retry columns
+
+Revision ID: 0112c70764e5
+Revises: b14eb79b5941
+Create Date: 2026-10-17 14:02:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0112c70764e5'
+down_revision: Union[str, Sequence[str], None] = 'b14eb79b5941'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('publish_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('posts', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('posts', sa.Column('last_publish_error', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'last_publish_error')
+    op.drop_column('posts', 'next_attempt_at')
+    op.drop_column('posts', 'publish_attempts')
@@ -0,0 +1,38 @@
+"""drop global rollup row
+
+Revision ID: 205423cc15df
+Revises: b7e05a9c3d21
+Create Date: 2026-10-17 05:50:23.343707
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '205423cc15df'
+down_revision: Union[str, Sequence[str], None] = 'b7e05a9c3d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+GLOBAL_ROLLUP_ID = "'00000000-0000-0000-0000-000000000000'::uuid"
+ROLLUP_COLUMNS = (
+    'total_posts', 'draft_posts', 'scheduled_posts', 'published_posts', 'failed_posts',
+    'like_count', 'praise_count', 'empathy_count', 'interest_count', 'appreciation_count',
+    'impressions_count', 'shares_count', 'comments_count',
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Admin summaries now sum the per-user rows
+    op.execute(f"DELETE FROM user_analytics_rollup WHERE user_id = {GLOBAL_ROLLUP_ID}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    totals = ", ".join(f"coalesce(sum({column}), 0)" for column in ROLLUP_COLUMNS)
+    op.execute(f"INSERT INTO user_analytics_rollup SELECT {GLOBAL_ROLLUP_ID}, {totals}, now() FROM user_analytics_rollup")
@@ -0,0 +1,32 @@
+"""add refresh token lifecycle indexes
+
+Revision ID: 4f8c2d7e9a13
+Revises: 9d4e6b2a1f37
+Create Date: 2026-10-17 19:27:51.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f8c2d7e9a13'
+down_revision: Union[str, Sequence[str], None] = '9d4e6b2a1f37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_refresh_tokens_user_created', 'refresh_tokens', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_refresh_tokens_expires_at', 'refresh_tokens', ['expires_at'], unique=False)
+    op.create_index('ix_refresh_tokens_revoked', 'refresh_tokens', ['id'], unique=False, postgresql_where=sa.text('is_active IS false'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_refresh_tokens_revoked', table_name='refresh_tokens', postgresql_where=sa.text('is_active IS false'))
+    op.drop_index('ix_refresh_tokens_expires_at', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_user_created', table_name='refresh_tokens')
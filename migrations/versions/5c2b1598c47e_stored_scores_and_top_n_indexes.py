@@ -0,0 +1,72 @@
+"""stored scores and top-n indexes on post_analytics
+
+Revision ID: 5c2b1598c47e
+Revises: 7b63c1a3f36e
+Create Date: 2026-10-17 11:20:54.640317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2b1598c47e'
+down_revision: Union[str, Sequence[str], None] = '7b63c1a3f36e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TOTAL_REACTIONS_SQL = (
+    "coalesce(like_count, 0) + coalesce(praise_count, 0) + coalesce(empathy_count, 0) + "
+    "coalesce(interest_count, 0) + coalesce(appreciation_count, 0)"
+)
+TOTAL_ENGAGEMENTS_SQL = f"{TOTAL_REACTIONS_SQL} + coalesce(shares_count, 0) + coalesce(comments_count, 0)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    poststatus = postgresql.ENUM('DRAFT', 'SCHEDULED', 'PUBLISHED', 'FAILED', name='poststatus', create_type=False)
+    op.add_column('post_analytics', sa.Column('user_id', sa.UUID(), nullable=True))
+    op.add_column('post_analytics', sa.Column('status', poststatus, nullable=True))
+    op.add_column('post_analytics', sa.Column('total_reactions', sa.Integer(), sa.Computed(TOTAL_REACTIONS_SQL, persisted=True), nullable=True))
+    op.add_column('post_analytics', sa.Column('total_engagements', sa.Integer(), sa.Computed(TOTAL_ENGAGEMENTS_SQL, persisted=True), nullable=True))
+    op.create_foreign_key('post_analytics_user_id_fkey', 'post_analytics', 'users', ['user_id'], ['id'])
+
+    # Every post gets an analytics row so top-N can inner join on it
+    op.execute("""
+        INSERT INTO post_analytics (id, post_id, like_count, praise_count, empathy_count, interest_count,
+            appreciation_count, impressions_count, shares_count, comments_count, updated_at)
+        SELECT gen_random_uuid(), p.id, 0, 0, 0, 0, 0, 0, 0, 0, now()
+        FROM posts p
+        WHERE NOT EXISTS (SELECT 1 FROM post_analytics pa WHERE pa.post_id = p.id)
+    """)
+    op.execute("""
+        UPDATE post_analytics pa
+        SET user_id = p.user_id, status = p.status
+        FROM posts p
+        WHERE p.id = pa.post_id
+    """)
+
+    op.create_index('ix_post_analytics_user_status_engagements', 'post_analytics', ['user_id', 'status', sa.text('total_engagements DESC')], unique=False)
+    op.create_index('ix_post_analytics_user_status_reactions', 'post_analytics', ['user_id', 'status', sa.text('total_reactions DESC')], unique=False)
+    op.create_index('ix_post_analytics_user_status_impressions', 'post_analytics', ['user_id', 'status', sa.text('impressions_count DESC')], unique=False)
+    op.create_index('ix_post_analytics_status_engagements', 'post_analytics', ['status', sa.text('total_engagements DESC')], unique=False)
+    op.create_index('ix_post_analytics_status_reactions', 'post_analytics', ['status', sa.text('total_reactions DESC')], unique=False)
+    op.create_index('ix_post_analytics_status_impressions', 'post_analytics', ['status', sa.text('impressions_count DESC')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_analytics_status_impressions', table_name='post_analytics')
+    op.drop_index('ix_post_analytics_status_reactions', table_name='post_analytics')
+    op.drop_index('ix_post_analytics_status_engagements', table_name='post_analytics')
+    op.drop_index('ix_post_analytics_user_status_impressions', table_name='post_analytics')
+    op.drop_index('ix_post_analytics_user_status_reactions', table_name='post_analytics')
+    op.drop_index('ix_post_analytics_user_status_engagements', table_name='post_analytics')
+    op.drop_constraint('post_analytics_user_id_fkey', 'post_analytics', type_='foreignkey')
+    op.drop_column('post_analytics', 'total_engagements')
+    op.drop_column('post_analytics', 'total_reactions')
+    op.drop_column('post_analytics', 'status')
+    op.drop_column('post_analytics', 'user_id')
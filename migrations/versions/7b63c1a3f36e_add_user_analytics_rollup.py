@@ -0,0 +1,67 @@
+"""add user_analytics_rollup
+
+Revision ID: 7b63c1a3f36e
+Revises: c06b5dbf37dc
+Create Date: 2026-10-17 10:03:27.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b63c1a3f36e'
+down_revision: Union[str, Sequence[str], None] = 'c06b5dbf37dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_SELECT = """
+    SELECT {user_id},
+        count(p.id),
+        count(p.id) FILTER (WHERE p.status = 'DRAFT'),
+        count(p.id) FILTER (WHERE p.status = 'SCHEDULED'),
+        count(p.id) FILTER (WHERE p.status = 'PUBLISHED'),
+        count(p.id) FILTER (WHERE p.status = 'FAILED'),
+        coalesce(sum(pa.like_count), 0),
+        coalesce(sum(pa.praise_count), 0),
+        coalesce(sum(pa.empathy_count), 0),
+        coalesce(sum(pa.interest_count), 0),
+        coalesce(sum(pa.appreciation_count), 0),
+        coalesce(sum(pa.impressions_count), 0),
+        coalesce(sum(pa.shares_count), 0),
+        coalesce(sum(pa.comments_count), 0),
+        now()
+    FROM posts p LEFT JOIN post_analytics pa ON pa.post_id = p.id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_analytics_rollup',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('total_posts', sa.Integer(), nullable=False),
+    sa.Column('draft_posts', sa.Integer(), nullable=False),
+    sa.Column('scheduled_posts', sa.Integer(), nullable=False),
+    sa.Column('published_posts', sa.Integer(), nullable=False),
+    sa.Column('failed_posts', sa.Integer(), nullable=False),
+    sa.Column('like_count', sa.BigInteger(), nullable=False),
+    sa.Column('praise_count', sa.BigInteger(), nullable=False),
+    sa.Column('empathy_count', sa.BigInteger(), nullable=False),
+    sa.Column('interest_count', sa.BigInteger(), nullable=False),
+    sa.Column('appreciation_count', sa.BigInteger(), nullable=False),
+    sa.Column('impressions_count', sa.BigInteger(), nullable=False),
+    sa.Column('shares_count', sa.BigInteger(), nullable=False),
+    sa.Column('comments_count', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Seed per-user rows and the global row from the existing data
+    op.execute("INSERT INTO user_analytics_rollup " + BACKFILL_SELECT.format(user_id="p.user_id") + " GROUP BY p.user_id")
+    op.execute("INSERT INTO user_analytics_rollup " + BACKFILL_SELECT.format(user_id="'00000000-0000-0000-0000-000000000000'::uuid"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_analytics_rollup')
@@ -0,0 +1,45 @@
+"""align post indexes with queries
+
+Revision ID: 9d4e6b2a1f37
+Revises: e3a91f04b7c2
+Create Date: 2026-10-17 18:12:45.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e6b2a1f37'
+down_revision: Union[str, Sequence[str], None] = 'e3a91f04b7c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SINGLE_COLUMN_INDEXES = ('user_id', 'status', 'scheduled_at', 'published_at', 'created_at')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built and dropped concurrently so a large posts table stays writable meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index('ix_posts_user_created', 'posts', ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_posts_user_status_created', 'posts', ['user_id', 'status', sa.text('created_at DESC'), sa.text('id DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_posts_created', 'posts', [sa.text('created_at DESC'), sa.text('id DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_posts_scheduled_due', 'posts', ['scheduled_at'], unique=False, postgresql_where=sa.text("status = 'SCHEDULED'"), postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_posts_scheduled_next_due', 'posts', [sa.text('coalesce(next_attempt_at, scheduled_at)')], unique=False, postgresql_where=sa.text("status = 'SCHEDULED'"), postgresql_concurrently=True, if_not_exists=True)
+        for column in SINGLE_COLUMN_INDEXES:
+            op.drop_index(f'ix_posts_{column}', table_name='posts', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for column in SINGLE_COLUMN_INDEXES:
+            op.create_index(f'ix_posts_{column}', 'posts', [column], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_posts_scheduled_next_due', table_name='posts', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_posts_scheduled_due', table_name='posts', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_posts_created', table_name='posts', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_posts_user_status_created', table_name='posts', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_posts_user_created', table_name='posts', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,30 @@
+"""add post claim lease columns
+
+Revision ID: 9fc487a9ae79
+Revises: 205423cc15df
+Create Date: 2026-10-17 06:14:46.912968
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9fc487a9ae79'
+down_revision: Union[str, Sequence[str], None] = '205423cc15df'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('claimed_by', sa.String(length=100), nullable=True))
+    op.add_column('posts', sa.Column('claimed_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'claimed_until')
+    op.drop_column('posts', 'claimed_by')
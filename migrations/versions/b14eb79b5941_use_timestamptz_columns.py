@@ -0,0 +1,47 @@
+"""use timestamptz columns
+
+Revision ID: b14eb79b5941
+Revises: 5c2b1598c47e
+Create Date: 2026-10-17 12:41:09.275531
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b14eb79b5941'
+down_revision: Union[str, Sequence[str], None] = '5c2b1598c47e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Existing naive values were written as UTC
+DATETIME_COLUMNS = {
+    'users': ['created_at', 'updated_at'],
+    'posts': ['scheduled_at', 'published_at', 'created_at', 'updated_at'],
+    'post_analytics': ['updated_at'],
+    'user_analytics_rollup': ['updated_at'],
+    'refresh_tokens': ['expires_at', 'created_at'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, columns in DATETIME_COLUMNS.items():
+        for column in columns:
+            op.alter_column(table, column,
+                type_=sa.DateTime(timezone=True),
+                existing_type=sa.DateTime(),
+                postgresql_using=f"{column} AT TIME ZONE 'UTC'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, columns in DATETIME_COLUMNS.items():
+        for column in columns:
+            op.alter_column(table, column,
+                type_=sa.DateTime(),
+                existing_type=sa.DateTime(timezone=True),
+                postgresql_using=f"{column} AT TIME ZONE 'UTC'")
@@ -0,0 +1,34 @@
+"""add refresh token revoked_at
+
+Revision ID: b7e05a9c3d21
+Revises: 4f8c2d7e9a13
+Create Date: 2026-10-17 20:48:16.217533
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e05a9c3d21'
+down_revision: Union[str, Sequence[str], None] = '4f8c2d7e9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('refresh_tokens', sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True))
+    # Tokens logged out so far become denylist entries
+    op.execute("UPDATE refresh_tokens SET revoked_at = now() WHERE is_active IS false")
+    op.drop_index('ix_refresh_tokens_revoked', table_name='refresh_tokens', postgresql_where=sa.text('is_active IS false'))
+    op.create_index('ix_refresh_tokens_revoked_at', 'refresh_tokens', ['revoked_at'], unique=False, postgresql_where=sa.text('revoked_at IS NOT NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_refresh_tokens_revoked_at', table_name='refresh_tokens', postgresql_where=sa.text('revoked_at IS NOT NULL'))
+    op.create_index('ix_refresh_tokens_revoked', 'refresh_tokens', ['id'], unique=False, postgresql_where=sa.text('is_active IS false'))
+    op.drop_column('refresh_tokens', 'revoked_at')
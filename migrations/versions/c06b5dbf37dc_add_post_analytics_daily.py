@@ -0,0 +1,41 @@
+"""add post_analytics_daily
+
+Revision ID: c06b5dbf37dc
+Revises: a26c8b902664
+Create Date: 2026-10-17 09:12:41.532018
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c06b5dbf37dc'
+down_revision: Union[str, Sequence[str], None] = 'a26c8b902664'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('post_analytics_daily',
+    sa.Column('post_id', sa.UUID(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('like_count', sa.Integer(), nullable=False),
+    sa.Column('praise_count', sa.Integer(), nullable=False),
+    sa.Column('empathy_count', sa.Integer(), nullable=False),
+    sa.Column('interest_count', sa.Integer(), nullable=False),
+    sa.Column('appreciation_count', sa.Integer(), nullable=False),
+    sa.Column('impressions_count', sa.Integer(), nullable=False),
+    sa.Column('shares_count', sa.Integer(), nullable=False),
+    sa.Column('comments_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('post_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('post_analytics_daily')
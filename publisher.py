@@ -0,0 +1,43 @@
+import asyncio
+import os
+import random
+from abc import ABC, abstractmethod
+
+class PublishError(Exception):
+    pass
+
+class Publisher(ABC):
+    """Sends a post to LinkedIn. Raise to report a failure; the scheduler retries with backoff."""
+
+    @abstractmethod
+    async def publish(self, post) -> None:
+        ...
+
+class LogPublisher(Publisher):
+    """Stand-in for the LinkedIn API call, only logs the post."""
+
+    async def publish(self, post) -> None:
+        print(f"Publishing post: {post.id} with title: {post.title}")
+
+class FakePublisher(Publisher):
+    """Simulated LinkedIn API with configurable latency and error rate, for throughput testing."""
+
+    def __init__(self, latency: float = 0.2, error_rate: float = 0.1):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    async def publish(self, post) -> None:
+        await asyncio.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise PublishError("Simulated LinkedIn API error")
+
+def get_publisher() -> Publisher:
+    name = os.getenv('SCHEDULER_PUBLISHER', 'log')
+    if name == 'fake':
+        return FakePublisher(
+            latency=float(os.getenv('FAKE_PUBLISHER_LATENCY', '0.2')),
+            error_rate=float(os.getenv('FAKE_PUBLISHER_ERROR_RATE', '0.1'))
+        )
+    if name != 'log':
+        raise ValueError(f"Unknown SCHEDULER_PUBLISHER: {name}")
+    return LogPublisher()
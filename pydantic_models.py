@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, NonNegativeInt
 from datetime import datetime
 from enum import Enum
-from typing import List
+from typing import List, Literal
+import uuid
 
 # AUTH MODELS
 
@@ -38,40 +39,91 @@ class PostUpdate(BaseModel):
     scheduled_at: datetime | None
 
 class PostResponse(BaseModel):
-    id: str
+    id: uuid.UUID
     title: str
     content: str | None
     status: str
     scheduled_at: datetime | None
     published_at: datetime | None
+    publish_attempts: int = 0
+    last_publish_error: str | None = None
     created_at: datetime
     updated_at: datetime
-    user_id: str
+    user_id: uuid.UUID
 
     class Config:
         from_attributes = True
 
 class PostListResponse(BaseModel):
     posts: list[PostResponse]
-    total: int
-    page: int
+    total: int | None  # None when include_total=false, or for cursor pages unless include_total=true
+    page: int | None  # None when paginating by cursor
     limit: int
+    next_cursor: str | None = None  # Pass as ?cursor= to fetch the next page
+
+class PostSearchResult(PostResponse):
+    rank: float = 0.0  # Higher is more relevant; title matches weigh more than content matches
+
+class PostSearchResponse(BaseModel):
+    posts: list[PostSearchResult]
+    limit: int
+    next_cursor: str | None = None  # Pass as ?cursor= with the same q to fetch the next page
+
+class BulkPostResult(BaseModel):
+    index: int  # Position of the item in the request
+    status: Literal["created", "invalid"]
+    post: PostResponse | None = None
+    detail: str | None = None
+
+class BulkPostResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkPostResult]
 
 # ANALYTICS MODELS
 
+class CounterIncrement(BaseModel):
+    inc: int
+
+# Each counter takes an absolute value or {"inc": n}, applied atomically in SQL
 class ReactionsUpdate(BaseModel):
-    like_count: int | None = None
-    praise_count: int | None = None
-    empathy_count: int | None = None
-    interest_count: int | None = None
-    appreciation_count: int | None = None
-    impressions_count: int | None = None
-    shares_count: int | None = None
-    comments_count: int | None = None
+    like_count: int | CounterIncrement | None = None
+    praise_count: int | CounterIncrement | None = None
+    empathy_count: int | CounterIncrement | None = None
+    interest_count: int | CounterIncrement | None = None
+    appreciation_count: int | CounterIncrement | None = None
+    impressions_count: int | CounterIncrement | None = None
+    shares_count: int | CounterIncrement | None = None
+    comments_count: int | CounterIncrement | None = None
+
+# Amounts to add, for the buffered events endpoint
+class AnalyticsEvents(BaseModel):
+    like_count: NonNegativeInt = 0
+    praise_count: NonNegativeInt = 0
+    empathy_count: NonNegativeInt = 0
+    interest_count: NonNegativeInt = 0
+    appreciation_count: NonNegativeInt = 0
+    impressions_count: NonNegativeInt = 0
+    shares_count: NonNegativeInt = 0
+    comments_count: NonNegativeInt = 0
+
+class BulkAnalyticsItem(ReactionsUpdate):
+    post_id: uuid.UUID
+
+class BulkAnalyticsResult(BaseModel):
+    index: int  # Position of the item in the request
+    post_id: uuid.UUID | None
+    status: Literal["updated", "not_found", "forbidden", "invalid"]
+    detail: str | None = None
+
+class BulkAnalyticsResponse(BaseModel):
+    updated: int
+    failed: int
+    results: List[BulkAnalyticsResult]
 
 class PostAnalyticsResponse(BaseModel):
-    id: str
-    post_id: str
+    id: uuid.UUID | None  # None until the post's first analytics write
+    post_id: uuid.UUID
     like_count: int
     praise_count: int
     empathy_count: int
@@ -89,13 +141,13 @@ class PostAnalyticsResponse(BaseModel):
 
 class PostWithAnalytics(BaseModel):
     # Post details
-    id: str
+    id: uuid.UUID
     title: str
     content: str | None
     status: str
     published_at: datetime | None
     created_at: datetime
-    user_id: str
+    user_id: uuid.UUID
     
     # Analytics data
     analytics: PostAnalyticsResponse | None
@@ -0,0 +1,70 @@
+#! /usr/bin/env python3
+
+# rebuilds user_analytics_rollup from posts/post_analytics and reports drift
+# usage: python reconcile_rollup.py [--dry-run]
+
+import sys
+from sqlalchemy import func, text
+from database import (
+    SessionLocal, 
+    Post, 
+    PostAnalytics, 
+    UserAnalyticsRollup, 
+    ROLLUP_STATUS_COLUMNS, 
+    ROLLUP_COLUMNS, 
+    ANALYTICS_COUNTERS
+)
+
+def compute_rollups(db) -> dict:
+    aggregates = [func.count(Post.id).label('total_posts')]
+    for status, column in ROLLUP_STATUS_COLUMNS.items():
+        aggregates.append(func.count(Post.id).filter(Post.status == status).label(column))
+    for field in ANALYTICS_COUNTERS:
+        aggregates.append(func.coalesce(func.sum(getattr(PostAnalytics, field)), 0).label(field))
+
+    rows = db.query(Post.user_id, *aggregates).outerjoin(
+        PostAnalytics, Post.id == PostAnalytics.post_id
+    ).group_by(Post.user_id).all()
+
+    return {row.user_id: {column: getattr(row, column) for column in ROLLUP_COLUMNS} for row in rows}
+
+def reconcile(dry_run: bool = False):
+    db = SessionLocal()
+    try:
+        # Block incremental rollup writers so the rebuild sees a consistent snapshot
+        db.execute(text("LOCK TABLE user_analytics_rollup IN EXCLUSIVE MODE"))
+        expected = compute_rollups(db)
+        stored = {row.user_id: row for row in db.query(UserAnalyticsRollup).all()}
+
+        drifted = 0
+        for user_id in expected.keys() | stored.keys():
+            want = expected.get(user_id, dict.fromkeys(ROLLUP_COLUMNS, 0))
+            row = stored.get(user_id)
+            have = {column: getattr(row, column) for column in ROLLUP_COLUMNS} if row else dict.fromkeys(ROLLUP_COLUMNS, 0)
+            drift = {column: have[column] - want[column] for column in ROLLUP_COLUMNS if have[column] != want[column]}
+            if not drift:
+                continue
+
+            drifted += 1
+            print(f"Drift for {user_id}: {drift}")
+            if dry_run:
+                continue
+            if row is None:
+                db.add(UserAnalyticsRollup(user_id=user_id, **want))
+            else:
+                for column, value in want.items():
+                    setattr(row, column, value)
+
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        print(f"Rollup rows checked: {len(expected.keys() | stored.keys())}, drifted: {drifted}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    reconcile(dry_run="--dry-run" in sys.argv)
@@ -1,145 +1,461 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, func
-from database import get_db, User, UserRole, Post, PostStatus, PostAnalytics
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy import select, update, desc, func, and_, cast, BigInteger
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import (
+    get_async_db, 
+    AsyncSessionLocal, 
+    User, 
+    UserRole, 
+    Post, 
+    PostStatus, 
+    PostAnalytics, 
+    PostAnalyticsDaily, 
+    UserAnalyticsRollup, 
+    ROLLUP_COLUMNS,
+    ANALYTICS_COUNTERS
+)
 from pydantic_models import (
     PostAnalyticsResponse,
     ReactionsUpdate,
+    CounterIncrement,
+    AnalyticsEvents,
+    BulkAnalyticsItem,
+    BulkAnalyticsResponse,
     TopPostsResponse,
-    PostAnalyticsGraph,
-    AnalyticsGraphData
+    PostAnalyticsGraph
+)
+from utils import (
+    get_current_user,
+    response_cache,
+    cached_json_response,
+    has_validators,
+    is_not_modified,
+    resource_etag,
+    validator_headers,
+    invalidate_analytics_cache,
+    user_cache_tag,
+    post_cache_tag,
+    ALL_POSTS_TAG,
+    filter_posts,
+    record_daily_analytics,
+    record_daily_analytics_batch,
+    apply_rollup_delta,
+    apply_rollup_deltas
 )
-from utils import get_current_user
+from cache import TTLCache
+from counter_buffer import counter_buffer
+import columnar_export
+from collections import Counter
+from enum import Enum
 from typing import Literal
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import asyncio
+import csv
+import io
+import json
+import os
 import uuid
 
 router = APIRouter()
 
+# Items applied per transaction by the bulk endpoint
+BULK_CHUNK_SIZE = int(os.getenv('ANALYTICS_BULK_CHUNK_SIZE', '1000'))
+
+# Rows fetched per round-trip by the export's server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv('ANALYTICS_EXPORT_BATCH_SIZE', '1000'))
+# Rows per Parquet row group / Arrow record batch
+COLUMNAR_BATCH_SIZE = int(os.getenv('ANALYTICS_COLUMNAR_BATCH_SIZE', '16384'))
+
+# Post owners never change, so the events endpoint can authorize from memory
+post_owner_cache = TTLCache(max_size=100_000, ttl=600)
+
+@router.get('/posts/top', response_model=TopPostsResponse)
+async def get_top_posts(
+    request: Request,
+    metric: Literal["engagement", "reactions", "impressions"] = Query("engagement"),
+    limit: int = Query(5, ge=1, le=50),
+    user_id: str | None = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    tags = [ALL_POSTS_TAG] if current_user.role == UserRole.ADMIN else [user_cache_tag(current_user.id)]
+    cache_key = response_cache.key("top", current_user.id, {"metric": metric, "limit": limit, "user_id": user_id}, tags)
+    body = response_cache.get(cache_key)
+    if body is None:
+        body = (await compute_top_posts(metric, limit, user_id, current_user, db)).model_dump_json().encode()
+        response_cache.set(cache_key, body)
+    return cached_json_response(request, body)
+
+async def compute_top_posts(metric: str, limit: int, user_id: str | None, current_user: User, db: AsyncSession) -> TopPostsResponse:
+    # Filter and sort on post_analytics' own columns so the (user_id, status, score DESC) index drives the scan
+    query = select(Post).join(
+        PostAnalytics, 
+        Post.id == PostAnalytics.post_id
+    ).options(contains_eager(Post.analytics))
+    
+    # Role-based filtering
+    if current_user.role != UserRole.ADMIN:
+        query = query.where(PostAnalytics.user_id == current_user.id)
+    elif user_id:
+        try:
+            user_uuid = uuid.UUID(user_id)
+            query = query.where(PostAnalytics.user_id == user_uuid)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid user_id format")
+    
+    query = query.where(PostAnalytics.status == PostStatus.PUBLISHED)
+    
+    if metric == "engagement":
+        query = query.order_by(desc(PostAnalytics.total_engagements))
+    elif metric == "reactions":
+        query = query.order_by(desc(PostAnalytics.total_reactions))
+    elif metric == "impressions":
+        query = query.order_by(desc(PostAnalytics.impressions_count))
+    
+    posts = (await db.scalars(query.limit(limit))).all()
+    
+    return TopPostsResponse(
+        posts=posts,
+        metric=metric,
+        limit=limit
+    )
+
+def split_counter_update(update: ReactionsUpdate) -> tuple[dict, dict]:
+    """Split a counter update into absolute values and {"inc": n} increments."""
+
+    absolutes = {}
+    increments = {}
+    for field in ANALYTICS_COUNTERS:
+        value = getattr(update, field)
+        if isinstance(value, CounterIncrement):
+            increments[field] = value.inc
+        elif value is not None:
+            absolutes[field] = value
+    return absolutes, increments
+
+async def read_bulk_items(request: Request):
+    """Yield raw items from a JSON array body, or line by line as an application/x-ndjson body streams in."""
+
+    if request.headers.get('content-type', '').startswith('application/x-ndjson'):
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for item in items:
+        yield item
+
+async def apply_bulk_chunk(chunk: list, current_user: User, db: AsyncSession) -> list:
+    """Authorize and apply a chunk of (index, BulkAnalyticsItem) in one transaction; returns per-item results."""
+
+    # Items for the same post are folded into one (ON CONFLICT can only touch each row once
+    # per statement): a later absolute value wins, increments add up. Values are (n, is_increment)
+    values_by_post = {}
+    for _, item in chunk:
+        values = values_by_post.setdefault(item.post_id, {})
+        absolutes, increments = split_counter_update(item)
+        for field, value in absolutes.items():
+            values[field] = (value, False)
+        for field, amount in increments.items():
+            value, is_increment = values.get(field, (0, True))
+            values[field] = (value + amount, is_increment)
+
+    # One query authorizes every post; the post locks (FOR NO KEY UPDATE) serialize bulk writers
+    rows = (await db.execute(
+        select(Post.id, Post.user_id, Post.status)
+        .where(Post.id.in_(values_by_post))
+        .order_by(Post.id)
+        .with_for_update(of=Post, key_share=True)
+    )).all()
+    found = {row.id: row for row in rows}
+
+    # Every analytics row this chunk writes is locked up front in post_id order, like the counter
+    # buffer flush does, and absolute values are diffed against the counters read under those locks
+    authorized = {
+        post_id for post_id, row in found.items()
+        if current_user.role == UserRole.ADMIN or row.user_id == current_user.id
+    }
+    written = sorted(post_id for post_id in authorized if values_by_post[post_id])
+    current = {}
+    if written:
+        current = {row.post_id: row for row in (await db.execute(
+            select(PostAnalytics.post_id, *(getattr(PostAnalytics, field) for field in ANALYTICS_COUNTERS))
+            .where(PostAnalytics.post_id.in_(written))
+            .order_by(PostAnalytics.post_id)
+            .with_for_update(key_share=True)
+        )).all()}
+
+    outcomes = {}
+    upserts = {}
+    daily_deltas = {}
+    rollup_deltas = {}
+    for post_id, values in sorted(values_by_post.items()):
+        row = found.get(post_id)
+        if row is None:
+            outcomes[post_id] = "not_found"
+            continue
+        if current_user.role != UserRole.ADMIN and row.user_id != current_user.id:
+            outcomes[post_id] = "forbidden"
+            continue
+        outcomes[post_id] = "updated"
+        if not values:
+            continue
+        deltas = {
+            field: value if is_increment else value - (getattr(current.get(post_id), field, 0) or 0)
+            for field, (value, is_increment) in values.items()
+        }
+        daily_deltas[post_id] = deltas
+        rollup_deltas.setdefault(row.user_id, Counter()).update(deltas)
+        upserts.setdefault(tuple(sorted((field, is_increment) for field, (_, is_increment) in values.items())), []).append(
+            {'post_id': post_id, 'user_id': row.user_id, 'status': row.status, **{field: value for field, (value, _) in values.items()}}
+        )
+
+    # One upsert per field set, so each item only touches the counters it sent; rows stay in post_id order
+    for fields, values in upserts.items():
+        stmt = pg_insert(PostAnalytics).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PostAnalytics.post_id],
+            set_={
+                **{
+                    field: func.coalesce(getattr(PostAnalytics, field), 0) + stmt.excluded[field] if is_increment else stmt.excluded[field]
+                    for field, is_increment in fields
+                },
+                'updated_at': func.now()
+            }
+        )
+        await db.execute(stmt)
+
+    await db.run_sync(lambda session: record_daily_analytics_batch(daily_deltas, session))
+    await db.run_sync(lambda session: apply_rollup_deltas(rollup_deltas, session))
+    await db.commit()
+    invalidate_analytics_cache(rollup_deltas, daily_deltas)
+
+    return [
+        {"index": index, "post_id": item.post_id, "status": outcomes[item.post_id]}
+        for index, item in chunk
+    ]
+
+@router.post('/posts/bulk', response_model=BulkAnalyticsResponse)
+async def bulk_update_post_analytics(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Absolute counter updates for many posts, as a JSON array or an NDJSON stream of
+    {"post_id": ..., "<counter>": n} objects. Each chunk of BULK_CHUNK_SIZE items commits on its own."""
+
+    results = []
+    chunk = []
+    index = 0
+    async for raw in read_bulk_items(request):
+        try:
+            if isinstance(raw, bytes):
+                item = BulkAnalyticsItem.model_validate_json(raw)
+            else:
+                item = BulkAnalyticsItem.model_validate(raw)
+        except ValidationError as e:
+            detail = "; ".join(error['msg'] for error in e.errors())
+            results.append({"index": index, "post_id": None, "status": "invalid", "detail": detail})
+        else:
+            chunk.append((index, item))
+            if len(chunk) == BULK_CHUNK_SIZE:
+                results.extend(await apply_bulk_chunk(chunk, current_user, db))
+                chunk = []
+        index += 1
+    if chunk:
+        results.extend(await apply_bulk_chunk(chunk, current_user, db))
+
+    results.sort(key=lambda result: result["index"])
+    updated = sum(1 for result in results if result["status"] == "updated")
+    return {"updated": updated, "failed": len(results) - updated, "results": results}
+
+async def load_post_with_analytics(post_uuid: uuid.UUID, current_user: User, db: AsyncSession,
+                                   action: str = "view", for_update: bool = False) -> Post:
+    """Post with its analytics row eagerly joined in one statement, after the 404/403 checks.
+
+    post.analytics is None when no row exists yet. With for_update the row is created
+    if missing and locked until the transaction ends.
+    """
+
+    def authorize(post):
+        if current_user.role != UserRole.ADMIN and post.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail=f"Not authorized to {action} this post's analytics")
+        return post
+
+    locked = select(Post).join(Post.analytics).options(contains_eager(Post.analytics)).where(
+        Post.id == post_uuid
+    ).with_for_update(of=PostAnalytics)
+    if for_update:
+        # Usual case: the analytics row exists and a single locking join does it all
+        post = await db.scalar(locked)
+        if post:
+            return authorize(post)
+
+    post = await db.scalar(select(Post).options(joinedload(Post.analytics)).where(Post.id == post_uuid))
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    authorize(post)
+    if for_update and post.analytics is None:
+        await db.execute(pg_insert(PostAnalytics).values(
+            post_id=post_uuid, user_id=post.user_id, status=post.status
+        ).on_conflict_do_nothing(index_elements=[PostAnalytics.post_id]))
+        post = await db.scalar(locked.execution_options(populate_existing=True))
+    return post
+
+def zeroed_analytics(post: Post) -> PostAnalytics:
+    """Unsaved all-zero analytics for a post whose row hasn't been written yet (reads never insert it)."""
+
+    return PostAnalytics(
+        post_id=post.id,
+        user_id=post.user_id,
+        status=post.status,
+        updated_at=post.created_at,
+        total_reactions=0,
+        total_engagements=0,
+        **dict.fromkeys(ANALYTICS_COUNTERS, 0)
+    )
+
 @router.get('/posts/{post_id}', response_model=PostAnalyticsResponse)
-def get_post_analytics(
+async def get_post_analytics(
     post_id: str,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         post_uuid = uuid.UUID(post_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid post ID format")
     
-    post = db.query(Post).filter(Post.id == post_uuid).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    if has_validators(request):
+        # Revalidation reads only the owner and version, no full row load or serialization
+        # A post without an analytics row is served as zeroes as of its creation
+        updated_at = func.coalesce(PostAnalytics.updated_at, Post.created_at).label('updated_at')
+        row = (await db.execute(
+            select(Post.user_id, updated_at)
+            .outerjoin(PostAnalytics, PostAnalytics.post_id == Post.id)
+            .where(Post.id == post_uuid)
+        )).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Post not found")
+        if current_user.role != UserRole.ADMIN and row.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to view this post's analytics")
+        etag = resource_etag(post_uuid, row.updated_at)
+        if is_not_modified(request, etag, row.updated_at):
+            return Response(status_code=304, headers=validator_headers(etag, row.updated_at))
     
-    if current_user.role != UserRole.ADMIN and post.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to view this post's analytics")
-    
-    analytics = db.query(PostAnalytics).filter(PostAnalytics.post_id == post_uuid).first()
-    if not analytics:
-        analytics = PostAnalytics(post_id=post_uuid)
-        db.add(analytics)
-        db.commit()
-        db.refresh(analytics)
+    post = await load_post_with_analytics(post_uuid, current_user, db)
+    analytics = post.analytics or zeroed_analytics(post)
     
+    response.headers.update(validator_headers(resource_etag(post_uuid, analytics.updated_at), analytics.updated_at))
     return analytics
 
 @router.put('/posts/{post_id}', response_model=PostAnalyticsResponse)
-def update_post_analytics(
+async def update_post_analytics(
     post_id: str,
     analytics_data: ReactionsUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         post_uuid = uuid.UUID(post_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid post ID format")
     
-    post = db.query(Post).filter(Post.id == post_uuid).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    absolutes, increments = split_counter_update(analytics_data)
     
-    # Check authorization - only admins or post owners can update analytics
-    if current_user.role != UserRole.ADMIN and post.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this post's analytics")
+    if increments and not absolutes:
+        # Delta mode: one atomic UPDATE ... RETURNING, nothing read first, so parallel writers can't lose updates
+        stmt = update(PostAnalytics).where(PostAnalytics.post_id == post_uuid).values({
+            **{
+                getattr(PostAnalytics, field): func.coalesce(getattr(PostAnalytics, field), 0) + amount
+                for field, amount in increments.items()
+            },
+            PostAnalytics.updated_at: func.now()
+        }).returning(PostAnalytics)
+        if current_user.role != UserRole.ADMIN:
+            stmt = stmt.where(PostAnalytics.user_id == current_user.id)
+        analytics = (await db.execute(stmt)).scalar_one_or_none()
+        if analytics:
+            await db.run_sync(lambda session: record_daily_analytics(post_uuid, increments, session))
+            await db.run_sync(lambda session: apply_rollup_delta(analytics.user_id, increments, session))
+            await db.commit()
+            invalidate_analytics_cache([analytics.user_id], [post_uuid])
+            return analytics
+        # No row matched: missing post, not the owner, or no analytics row yet; the path below sorts it out
+    
+    # Only admins or post owners can update analytics; the row comes back locked so
+    # absolute values are diffed against what they replace
+    post = await load_post_with_analytics(post_uuid, current_user, db, action="update", for_update=True)
+    analytics = post.analytics
     
-    analytics = db.query(PostAnalytics).filter(PostAnalytics.post_id == post_uuid).first()
-    if not analytics:
-        analytics = PostAnalytics(post_id=post_uuid)
-        db.add(analytics)
-        db.flush()  # Get the ID without committing
+    deltas = dict(increments)
+    for field, value in absolutes.items():
+        deltas[field] = value - (getattr(analytics, field) or 0)
+    for field, delta in deltas.items():
+        setattr(analytics, field, (getattr(analytics, field) or 0) + delta)
     
-    update_data = analytics_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        if value is not None:  # Only update non-None values
-            setattr(analytics, field, value)
+    # Append today's change to the per-day history and the rollups in the same transaction
+    await db.run_sync(lambda session: record_daily_analytics(post_uuid, deltas, session))
+    await db.run_sync(lambda session: apply_rollup_delta(post.user_id, deltas, session))
     
-    db.commit()
-    db.refresh(analytics)
+    await db.commit()
+    invalidate_analytics_cache([post.user_id], [post_uuid])
+    await db.refresh(analytics)
     
     return analytics
 
-@router.get('/posts/top', response_model=TopPostsResponse)
-def get_top_posts(
-    metric: Literal["engagement", "reactions", "impressions"] = Query("engagement"),
-    limit: int = Query(5, ge=1, le=50),
-    user_id: str | None = None,
+@router.post('/posts/{post_id}/events', status_code=202)
+async def record_post_events(
+    post_id: str,
+    events: AnalyticsEvents,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Post).join(
-        PostAnalytics, 
-        Post.id == PostAnalytics.post_id,
-        isouter=True  # LEFT JOIN to include posts without analytics
-    ).options(joinedload(Post.analytics))
-    
-    # Role-based filtering
-    if current_user.role != UserRole.ADMIN:
-        query = query.filter(Post.user_id == current_user.id)
-    elif user_id:
-        try:
-            user_uuid = uuid.UUID(user_id)
-            query = query.filter(Post.user_id == user_uuid)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid user_id format")
-    
-    query = query.filter(Post.status == PostStatus.PUBLISHED)
+    """Queue counter increments for a hot post; they are written in the next buffer flush."""
+
+    try:
+        post_uuid = uuid.UUID(post_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid post ID format")
     
-    if metric == "engagement":
-        query = query.order_by(desc(
-            PostAnalytics.like_count + 
-            PostAnalytics.praise_count + 
-            PostAnalytics.empathy_count + 
-            PostAnalytics.interest_count + 
-            PostAnalytics.appreciation_count + 
-            PostAnalytics.shares_count + 
-            PostAnalytics.comments_count
-        ))
-    elif metric == "reactions":
-        query = query.order_by(desc(
-            PostAnalytics.like_count + 
-            PostAnalytics.praise_count + 
-            PostAnalytics.empathy_count + 
-            PostAnalytics.interest_count + 
-            PostAnalytics.appreciation_count
-        ))
-    elif metric == "impressions":
-        query = query.order_by(desc(PostAnalytics.impressions_count))
+    owner_id = post_owner_cache.get(post_uuid)
+    if owner_id is None:
+        owner_id = await db.scalar(select(Post.user_id).where(Post.id == post_uuid))
+        if owner_id is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        post_owner_cache.set(post_uuid, owner_id)
     
-    posts = query.limit(limit).all()
+    if current_user.role != UserRole.ADMIN and owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this post's analytics")
     
-    return TopPostsResponse(
-        posts=posts,
-        metric=metric,
-        limit=limit
-    )
+    counter_buffer.add(post_uuid, events.model_dump())
+    return {"detail": "accepted"}
 
 @router.get('/posts/{post_id}/graph', response_model=PostAnalyticsGraph)
-def get_post_analytics_graph(
+async def get_post_analytics_graph(
+    request: Request,
     post_id: str,
     days: int = Query(30, ge=1, le=365),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
 
     try:
@@ -147,118 +463,215 @@ def get_post_analytics_graph(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid post ID format")
     
-    post = db.query(Post).filter(Post.id == post_uuid).first()
-    if not post:
+    end_day = datetime.now(timezone.utc).date()
+    # Entries are per viewer, created only after the ownership check below passed
+    cache_key = response_cache.key(
+        "graph", current_user.id, {"post_id": post_uuid, "days": days, "end_day": end_day}, [post_cache_tag(post_uuid)]
+    )
+    body = response_cache.get(cache_key)
+    if body is not None:
+        return cached_json_response(request, body)
+    
+    start_day = end_day - timedelta(days=days - 1)
+    
+    # One statement: the post (owner and title) left-joined to a range scan over the (post_id, day) primary key
+    rows = (await db.execute(select(
+        Post.user_id,
+        Post.title,
+        PostAnalyticsDaily.day,
+        PostAnalyticsDaily.total_reactions.label('reactions'),
+        PostAnalyticsDaily.total_engagements.label('engagements'),
+        PostAnalyticsDaily.impressions_count.label('impressions'),
+        PostAnalyticsDaily.shares_count.label('shares'),
+        PostAnalyticsDaily.comments_count.label('comments')
+    ).outerjoin(PostAnalyticsDaily, and_(
+        PostAnalyticsDaily.post_id == Post.id,
+        PostAnalyticsDaily.day >= start_day,
+        PostAnalyticsDaily.day <= end_day
+    )).where(Post.id == post_uuid))).all()
+    if not rows:
         raise HTTPException(status_code=404, detail="Post not found")
     
+    post = rows[0]
     if current_user.role != UserRole.ADMIN and post.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this post's analytics")
     
-    analytics = db.query(PostAnalytics).filter(PostAnalytics.post_id == post_uuid).first()
+    history = {}
+    for row in rows:
+        if row.day is None:
+            continue  # Post without history in range
+        point = row._asdict()
+        del point["user_id"], point["title"]
+        history[point.pop("day")] = point
+    zero_day = {"reactions": 0, "engagements": 0, "impressions": 0, "shares": 0, "comments": 0}
     
-    # For simplicity, we'll simulate daily breakdown data
-    graph_data = []
-    
-    if analytics:
-
-        for i in range(days):
-            date = (datetime.now() - timedelta(days=days-i-1)).strftime("%Y-%m-%d")
-            
-            factor = (i + 1) / days
-            
-            graph_data.append(AnalyticsGraphData(
-                date=date,
-                reactions=int(analytics.total_reactions * factor),
-                engagements=int(analytics.total_engagements * factor),
-                impressions=int(analytics.impressions_count * factor),
-                shares=int(analytics.shares_count * factor),
-                comments=int(analytics.comments_count * factor)
-            ))
-    else:
-        # Return zeros if no analytics exist
-        for i in range(days):
-            date = (datetime.now() - timedelta(days=days-i-1)).strftime("%Y-%m-%d")
-            graph_data.append(AnalyticsGraphData(
-                date=date,
-                reactions=0,
-                engagements=0,
-                impressions=0,
-                shares=0,
-                comments=0
-            ))
+    # Zero-fill days without activity; the points are plain dicts encoded straight to bytes
+    # in the PostAnalyticsGraph shape, with no per-point model instances
+    graph_data = [
+        {"date": (start_day + timedelta(days=i)).isoformat(), **history.get(start_day + timedelta(days=i), zero_day)}
+        for i in range(days)
+    ]
     
-    return PostAnalyticsGraph(
-        post_id=post_id,
-        post_title=post.title,
-        data=graph_data
+    body = json.dumps({"post_id": post_id, "post_title": post.title, "data": graph_data}).encode()
+    response_cache.set(cache_key, body)
+    return cached_json_response(request, body)
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+@router.get('/export')
+async def export_posts(
+    format: Literal["csv", "ndjson", "parquet", "arrow"] = Query("csv"),
+    status: PostStatus | None = None,
+    user_id: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    dictionary: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream every matching post with its analytics; memory use is bounded by the cursor batch size.
+
+    parquet/arrow are admin-only columnar exports (pyarrow required); dictionary=true
+    dictionary-encodes status and user_id in them.
+    """
+
+    columnar = format in ("parquet", "arrow")
+    if columnar:
+        if current_user.role != UserRole.ADMIN:
+            raise HTTPException(status_code=403, detail="Only admins can export columnar datasets")
+        if columnar_export.pa is None:
+            raise HTTPException(status_code=501, detail="Columnar export requires pyarrow")
+
+    query = filter_posts(
+        select(
+            Post.id.label('post_id'),
+            Post.user_id,
+            Post.title,
+            Post.status,
+            Post.scheduled_at,
+            Post.published_at,
+            Post.created_at,
+            *(func.coalesce(getattr(PostAnalytics, field), 0).label(field) for field in ANALYTICS_COUNTERS),
+            func.coalesce(PostAnalytics.total_reactions, 0).label('total_reactions'),
+            func.coalesce(PostAnalytics.total_engagements, 0).label('total_engagements')
+        ).outerjoin(PostAnalytics, PostAnalytics.post_id == Post.id),
+        current_user, status, user_id, created_from, created_to
+    ).order_by(Post.created_at.desc(), Post.id.desc()).execution_options(
+        yield_per=COLUMNAR_BATCH_SIZE if columnar else EXPORT_BATCH_SIZE
+    )
+
+    async def generate():
+        # The request-scoped session is closed before the body streams, so the export opens its own
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query)
+            columns = list(result.keys())
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if format == "csv":
+                writer.writerow(columns)
+            async for rows in result.partitions():
+                for row in rows:
+                    values = [export_value(value) for value in row]
+                    if format == "csv":
+                        writer.writerow(values)
+                    else:
+                        buffer.write(json.dumps(dict(zip(columns, values))) + "\n")
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+
+    async def generate_columnar():
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query)
+            writer = columnar_export.ColumnarWriter(
+                format, columnar_export.arrow_schema(query.selected_columns, dictionary)
+            )
+            # Each cursor partition becomes one record batch / row group, encoded off the event loop
+            async for rows in result.partitions():
+                yield await asyncio.to_thread(writer.write, rows)
+            yield writer.close()
+
+    if columnar:
+        return StreamingResponse(
+            generate_columnar(),
+            media_type=columnar_export.MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="posts_export.{columnar_export.FILE_EXTENSIONS[format]}"'}
+        )
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="posts_export.{format}"'}
     )
 
 @router.get('/summary')
-def get_user_analytics_summary(
+async def get_user_analytics_summary(
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
 
-    posts_query = db.query(Post).filter(Post.user_id == current_user.id)
-    
+    tags = [ALL_POSTS_TAG] if current_user.role == UserRole.ADMIN else [user_cache_tag(current_user.id)]
+    cache_key = response_cache.key("summary", current_user.id, {}, tags)
+    body = response_cache.get(cache_key)
+    if body is None:
+        body = json.dumps(await compute_analytics_summary(current_user, db)).encode()
+        response_cache.set(cache_key, body)
+    return cached_json_response(request, body)
+
+async def compute_analytics_summary(current_user: User, db: AsyncSession) -> dict:
     if current_user.role == UserRole.ADMIN:
-        # Admin can see all posts summary
-        posts_query = db.query(Post)
-    
-    # Get summary statistics
-    total_posts = posts_query.count()
-    published_posts = posts_query.filter(Post.status == PostStatus.PUBLISHED).count()
-    scheduled_posts = posts_query.filter(Post.status == PostStatus.SCHEDULED).count()
-    draft_posts = posts_query.filter(Post.status == PostStatus.DRAFT).count()
-    
-    # Get analytics totals
-    analytics_query = db.query(PostAnalytics).join(Post)
-    
-    if current_user.role != UserRole.ADMIN:
-        analytics_query = analytics_query.filter(Post.user_id == current_user.id)
-    
-    totals = analytics_query.with_entities(
-        func.sum(PostAnalytics.like_count).label('total_likes'),
-        func.sum(PostAnalytics.praise_count).label('total_praise'),
-        func.sum(PostAnalytics.empathy_count).label('total_empathy'),
-        func.sum(PostAnalytics.interest_count).label('total_interest'),
-        func.sum(PostAnalytics.appreciation_count).label('total_appreciation'),
-        func.sum(PostAnalytics.impressions_count).label('total_impressions'),
-        func.sum(PostAnalytics.shares_count).label('total_shares'),
-        func.sum(PostAnalytics.comments_count).label('total_comments'),
-    ).first()
+        # Admin can see all posts summary, summed over every user's rollup row
+        result = await db.execute(select(
+            *[cast(func.coalesce(func.sum(getattr(UserAnalyticsRollup, column)), 0), BigInteger).label(column) for column in ROLLUP_COLUMNS]
+        ))
+        totals = result.one()
+    else:
+        totals = await db.get(UserAnalyticsRollup, current_user.id)
+        if not totals:
+            # Nothing written yet for this user
+            totals = UserAnalyticsRollup(user_id=current_user.id, **dict.fromkeys(ROLLUP_COLUMNS, 0))
     
     total_reactions = (
-        (totals.total_likes or 0) +
-        (totals.total_praise or 0) +
-        (totals.total_empathy or 0) +
-        (totals.total_interest or 0) +
-        (totals.total_appreciation or 0)
+        totals.like_count +
+        totals.praise_count +
+        totals.empathy_count +
+        totals.interest_count +
+        totals.appreciation_count
     )
     
-    total_engagements = total_reactions + (totals.total_shares or 0) + (totals.total_comments or 0)
+    total_engagements = total_reactions + totals.shares_count + totals.comments_count
     
     return {
         "user_id": str(current_user.id),
         "user_name": current_user.name,
         "posts_summary": {
-            "total_posts": total_posts,
-            "published_posts": published_posts,
-            "scheduled_posts": scheduled_posts,
-            "draft_posts": draft_posts
+            "total_posts": totals.total_posts,
+            "published_posts": totals.published_posts,
+            "scheduled_posts": totals.scheduled_posts,
+            "draft_posts": totals.draft_posts
         },
         "engagement_summary": {
             "total_reactions": total_reactions,
             "total_engagements": total_engagements,
-            "total_impressions": totals.total_impressions or 0,
-            "total_shares": totals.total_shares or 0,
-            "total_comments": totals.total_comments or 0,
+            "total_impressions": totals.impressions_count,
+            "total_shares": totals.shares_count,
+            "total_comments": totals.comments_count,
             "breakdown": {
-                "likes": totals.total_likes or 0,
-                "praise": totals.total_praise or 0,
-                "empathy": totals.total_empathy or 0,
-                "interest": totals.total_interest or 0,
-                "appreciation": totals.total_appreciation or 0
+                "likes": totals.like_count,
+                "praise": totals.praise_count,
+                "empathy": totals.empathy_count,
+                "interest": totals.interest_count,
+                "appreciation": totals.appreciation_count
             }
         }
     }
\ No newline at end of file
@@ -1,74 +1,91 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db, User, UserRole, RefreshToken
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from database import get_async_db, User, UserRole, RefreshToken
 from pydantic_models import UserRegister, UserLogin, RefreshTokenRequest
 from utils import (
     hash_password, 
     get_current_user, 
-    verify_password, 
+    verify_and_update_password, 
+    run_password_job, 
     generate_access_token, 
     generate_refresh_token, 
     refresh_access_token, 
-    deactivate_refresh_token
+    deactivate_refresh_token,
+    enforce_refresh_token_cap
 )
+from token_denylist import token_denylist
 
 router = APIRouter()
 
 @router.post('/signup')
-def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
-    already_exists = db.query(User).filter(User.email == user_data.email).first()
+async def register_user(user_data: UserRegister, db: AsyncSession = Depends(get_async_db)):
+    already_exists = await db.scalar(select(User).where(User.email == user_data.email))
     if already_exists:
         raise HTTPException(status_code=400, detail="User already registered")
     
     new_user = User(
         name=user_data.name,
         email=user_data.email,
-        password_hash=hash_password(user_data.password),
+        password_hash=await run_password_job(hash_password, user_data.password),
         role=UserRole.USER
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     return {"user_name": new_user.name, "detail": "User registered successfully"}
 
 @router.post('/admin/signup')
-def register_admin(
+async def register_admin(
     signup_data: UserRegister, 
     current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admin can create another admin")
     
-    already_exists = db.query(User).filter(User.email == signup_data.email).first()
+    already_exists = await db.scalar(select(User).where(User.email == signup_data.email))
     if already_exists:
         raise HTTPException(status_code=400, detail="Admin already registered")
     
     new_admin = User(
         name=signup_data.name,
         email=signup_data.email,
-        password_hash=hash_password(signup_data.password),
+        password_hash=await run_password_job(hash_password, signup_data.password),
         role=UserRole.ADMIN
     )
     db.add(new_admin)
-    db.commit()
-    db.refresh(new_admin)
+    await db.commit()
     return {"admin_name": new_admin.name, "detail": "Admin registered successfully"}
 
 @router.post('/login')
-def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
-    stored_user = db.query(User).filter(User.email == credentials.email).first()
-    if not stored_user or not verify_password(credentials.password, stored_user.password_hash):
+async def login_user(credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    stored_user = await db.scalar(select(User).where(User.email == credentials.email))
+    if not stored_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    # End the read-only transaction so the pooled connection isn't held while bcrypt runs
+    await db.commit()
+    
+    valid, new_hash = await run_password_job(verify_and_update_password, credentials.password, stored_user.password_hash)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    # Transparently rehash when BCRYPT_ROUNDS changed, saved with the refresh token below
+    if new_hash:
+        stored_user.password_hash = new_hash
     
     access_token = generate_access_token({"sub": stored_user.email})
-    refresh_token, jti = generate_refresh_token({"sub": stored_user.email})
+    refresh_token, jti, expires_at = generate_refresh_token({"sub": stored_user.email})
 
-    db_refresh_token = RefreshToken(jti=jti, user_id=stored_user.id)
+    db_refresh_token = RefreshToken(jti=jti, user_id=stored_user.id, expires_at=expires_at)
     db.add(db_refresh_token)
-    db.commit()
+    await db.flush()
+    user_id = stored_user.id
+    revoked = await db.run_sync(lambda session: enforce_refresh_token_cap(user_id, session))
+    await db.commit()
+    for revoked_jti, revoked_expires_at in revoked:
+        token_denylist.revoke(revoked_jti, revoked_expires_at)
 
     return {
         "access_token": access_token,
@@ -77,11 +94,11 @@ def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.post('/refresh')
-def issue_new_token(token: RefreshTokenRequest, db: Session = Depends(get_db)):
-    new_access_token = refresh_access_token(token.refresh_token, db)
+async def issue_new_token(token: RefreshTokenRequest):
+    new_access_token = refresh_access_token(token.refresh_token)
     return {"access_token": new_access_token, "token_type": "bearer"}
 
 @router.post('/logout')
-def logout_user(token: RefreshTokenRequest, db: Session = Depends(get_db)):
-    deactivate_refresh_token(token.refresh_token, db)
+async def logout_user(token: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    await deactivate_refresh_token(token.refresh_token, db)
     return {"detail": "Logged out successfully"}
\ No newline at end of file
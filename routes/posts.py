@@ -1,104 +1,255 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from database import get_db, User, UserRole, Post, PostStatus
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import select, func, tuple_, cast, REAL
+from database import get_async_db, User, UserRole, Post, PostStatus, PostAnalytics, ANALYTICS_COUNTERS, SEARCH_CONFIG
 from pydantic_models import (
     PostCreate, 
     PostUpdate, 
     PostResponse,
-    PostListResponse
+    PostListResponse,
+    PostSearchResult,
+    PostSearchResponse,
+    BulkPostResponse
 )
-from utils import get_current_user, create_post_analytics
+from utils import (
+    get_current_user, 
+    create_post_analytics, 
+    create_posts_with_analytics,
+    apply_rollup_delta, 
+    status_change_delta, 
+    sync_analytics_status, 
+    notify_post_scheduled, 
+    notify_posts_scheduled,
+    encode_cursor, 
+    decode_cursor,
+    encode_search_cursor,
+    decode_search_cursor,
+    rank_posts_in_memory,
+    filter_posts,
+    invalidate_analytics_cache,
+    has_validators,
+    is_not_modified,
+    resource_etag,
+    validator_headers
+)
+import os
 import uuid
+from collections import Counter
 from datetime import datetime, timezone
 
 router = APIRouter()
 
-@router.post('/', response_model=PostResponse)
-def create_post(
-    post_data: PostCreate, 
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    post_status = PostStatus.DRAFT
-    published_at = None
-    
+# Upper bound on items per POST /posts/bulk request, all inserted in one transaction
+BULK_CREATE_MAX_ITEMS = int(os.getenv('POSTS_BULK_MAX_ITEMS', '1000'))
+
+def resolve_post_status(post_data: PostCreate, now: datetime) -> tuple:
+    """(status, scheduled_at, published_at) for a new post; raises 400 on a bad schedule."""
+
     # Handle immediate publish
     if post_data.publish_now:
-        post_status = PostStatus.PUBLISHED
-        published_at = datetime.now(timezone.utc)
         if post_data.scheduled_at:
              raise HTTPException(status_code=400, detail="Cannot schedule and publish immediately at the same time")
+        return PostStatus.PUBLISHED, None, now
     
     # Handle scheduling for a future time
-    elif post_data.scheduled_at:
-        if post_data.scheduled_at <= datetime.now(timezone.utc):
+    if post_data.scheduled_at:
+        if post_data.scheduled_at <= now:
             raise HTTPException(status_code=400, detail="Scheduled time cannot be in the past")
-        post_status = PostStatus.SCHEDULED
+        return PostStatus.SCHEDULED, post_data.scheduled_at, None
+
+    return PostStatus.DRAFT, None, None
+
+@router.post('/', response_model=PostResponse)
+async def create_post(
+    post_data: PostCreate, 
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    post_status, scheduled_at, published_at = resolve_post_status(post_data, datetime.now(timezone.utc))
 
     new_post = Post(
         user_id=current_user.id,
         title=post_data.title,
         content=post_data.content,
         status=post_status,
-        scheduled_at=post_data.scheduled_at if post_status == PostStatus.SCHEDULED else None,
+        scheduled_at=scheduled_at,
         published_at=published_at
     )
     
+    # Post, analytics row, rollup and notification commit together
     db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
-    
-    create_post_analytics(str(new_post.id), db)
+    await db.flush()
+    create_post_analytics(new_post.id, db, user_id=new_post.user_id, status=new_post.status)
+    await db.run_sync(lambda session: apply_rollup_delta(current_user.id, status_change_delta(None, post_status), session))
+    if post_status == PostStatus.SCHEDULED:
+        await db.run_sync(lambda session: notify_post_scheduled(new_post.id, new_post.scheduled_at, session))
+    await db.commit()
+    invalidate_analytics_cache([current_user.id])
+    await db.refresh(new_post)
     
     return new_post
 
+@router.post('/bulk', response_model=BulkPostResponse)
+async def bulk_create_posts(
+    items: list = Body(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create many posts from a JSON array of PostCreate objects in one transaction.
+
+    Items that fail validation are reported by index and skipped; the rest are inserted
+    together with their analytics rows.
+    """
+
+    if len(items) > BULK_CREATE_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_CREATE_MAX_ITEMS} posts per request")
+
+    now = datetime.now(timezone.utc)
+    results = []
+    rows = []
+    indexes = []
+    for index, raw in enumerate(items):
+        try:
+            post_data = PostCreate.model_validate(raw)
+            post_status, scheduled_at, published_at = resolve_post_status(post_data, now)
+        except ValidationError as e:
+            detail = "; ".join(error['msg'] for error in e.errors())
+            results.append({"index": index, "status": "invalid", "detail": detail})
+            continue
+        except HTTPException as e:
+            results.append({"index": index, "status": "invalid", "detail": e.detail})
+            continue
+        rows.append({
+            'user_id': current_user.id,
+            'title': post_data.title,
+            'content': post_data.content,
+            'status': post_status,
+            'scheduled_at': scheduled_at,
+            'published_at': published_at
+        })
+        indexes.append(index)
+
+    if rows:
+        posts = await db.run_sync(lambda session: create_posts_with_analytics(rows, session))
+        deltas = Counter()
+        for post in posts:
+            deltas.update(status_change_delta(None, post.status))
+        await db.run_sync(lambda session: apply_rollup_delta(current_user.id, deltas, session))
+        schedules = [(post.id, post.scheduled_at) for post in posts if post.status == PostStatus.SCHEDULED]
+        await db.run_sync(lambda session: notify_posts_scheduled(schedules, session))
+        await db.commit()
+        invalidate_analytics_cache([current_user.id])
+        for index, post in zip(indexes, posts):
+            results.append({"index": index, "status": "created", "post": post})
+
+    results.sort(key=lambda result: result["index"])
+    return {"created": len(rows), "failed": len(results) - len(rows), "results": results}
+
 @router.get('/', response_model=PostListResponse)
-def get_posts(
+async def get_posts(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     status: PostStatus | None = None,
     user_id: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    cursor: str | None = None,
+    include_total: bool | None = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Base query
-    query = db.query(Post)
-    
-    # Role-based filtering
-    if current_user.role != UserRole.ADMIN:
-        # Regular users can only see their own posts
-        query = query.filter(Post.user_id == current_user.id)
-    elif user_id:
-        # Admin can filter by specific user_id
-        try:
-            user_uuid = uuid.UUID(user_id)
-            query = query.filter(Post.user_id == user_uuid)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid user_id format")
+    query = filter_posts(select(Post), current_user, status, user_id, created_from, created_to)
+    
+    # Get total count (the expensive part on large accounts); cursor pages skip it unless asked
+    if include_total is None:
+        include_total = cursor is None
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
     
-    # Status filter
-    if status:
-        query = query.filter(Post.status == status)
+    # Newest first, id breaks ties so pages are stable
+    query = query.order_by(Post.created_at.desc(), Post.id.desc())
     
-    # Get total count
-    total = query.count()
+    if cursor:
+        # Keyset pagination: continue strictly after the last row of the previous page
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(Post.created_at, Post.id) < tuple_(cursor_created_at, cursor_id))
+        page = None
+    else:
+        query = query.offset((page - 1) * limit)
     
-    # Apply pagination
-    offset = (page - 1) * limit
-    posts = query.offset(offset).limit(limit).all()
+    # Fetch one extra row to know whether a next page exists
+    posts = (await db.scalars(query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
     
     return PostListResponse(
         posts=posts,
         total=total,
         page=page,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
+    )
+
+@router.get('/search', response_model=PostSearchResponse)
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=100),
+    status: PostStatus | None = None,
+    user_id: str | None = None,
+    cursor: str | None = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Full-text search over title and content (web search syntax: "quoted phrases", or, -excluded),
+    best matches first, paginated by cursor."""
+
+    query = filter_posts(select(Post), current_user, status, user_id)
+    after = decode_search_cursor(cursor) if cursor else None
+
+    if db.bind.dialect.name == 'postgresql':
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        rank = func.ts_rank(Post.search_vector, ts_query)
+        query = query.add_columns(rank).where(Post.search_vector.bool_op('@@')(ts_query))
+        if after:
+            # Keyset pagination over (rank, created_at, id); the cursor's rank is compared as ts_rank's real
+            after_rank, after_created_at, after_id = after
+            query = query.where(
+                tuple_(rank, Post.created_at, Post.id) < tuple_(cast(after_rank, REAL), after_created_at, after_id)
+            )
+        query = query.order_by(rank.desc(), Post.created_at.desc(), Post.id.desc())
+        rows = (await db.execute(query.limit(limit + 1))).all()
+    else:
+        rows = rank_posts_in_memory((await db.scalars(query)).all(), q)
+        rows.sort(key=lambda row: (row[1], row[0].created_at, row[0].id), reverse=True)
+        if after:
+            rows = [row for row in rows if (row[1], row[0].created_at, row[0].id) < after]
+        rows = rows[:limit + 1]
+
+    # Fetch one extra row to know whether a next page exists
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_post, last_rank = rows[-1]
+        next_cursor = encode_search_cursor(last_rank, last_post.created_at, last_post.id)
+
+    return PostSearchResponse(
+        posts=[PostSearchResult.model_validate(post).model_copy(update={"rank": rank}) for post, rank in rows],
+        limit=limit,
+        next_cursor=next_cursor
     )
 
 @router.get('/{post_id}', response_model=PostResponse)
-def get_post(
+async def get_post(
     post_id: str,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Validate UUID format
     try:
@@ -106,8 +257,19 @@ def get_post(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid post ID format")
     
+    if has_validators(request):
+        # Revalidation reads only the owner and version, no full row load or serialization
+        row = (await db.execute(select(Post.user_id, Post.updated_at).where(Post.id == post_uuid))).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Post not found")
+        if current_user.role != UserRole.ADMIN and row.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to view this post")
+        etag = resource_etag(post_uuid, row.updated_at)
+        if is_not_modified(request, etag, row.updated_at):
+            return Response(status_code=304, headers=validator_headers(etag, row.updated_at))
+    
     # Get the post
-    post = db.query(Post).filter(Post.id == post_uuid).first()
+    post = await db.scalar(select(Post).where(Post.id == post_uuid))
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -115,14 +277,15 @@ def get_post(
     if current_user.role != UserRole.ADMIN and post.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this post")
     
+    response.headers.update(validator_headers(resource_etag(post.id, post.updated_at), post.updated_at))
     return post
 
 @router.put('/{post_id}', response_model=PostResponse)
-def update_post(                                                # you are here
+async def update_post(                                                # you are here
     post_id: str,
     post_data: PostUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Validate UUID format
     try:
@@ -130,8 +293,8 @@ def update_post(                                                # you are here
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid post ID format")
     
-    # Get the post
-    post = db.query(Post).filter(Post.id == post_uuid).first()
+    # Get the post, locked so a concurrent publish can't apply a status delta from the same old status
+    post = await db.scalar(select(Post).where(Post.id == post_uuid).with_for_update(key_share=True))
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -141,6 +304,11 @@ def update_post(                                                # you are here
     
     # Update fields
     update_data = post_data.model_dump(exclude_unset=True)
+    old_status = post.status
+
+    if update_data.get('status') is not None:
+        # Map the API enum onto the database enum
+        update_data['status'] = PostStatus(update_data['status'].value)
 
     if 'scheduled_at' in update_data:
         scheduled_at = update_data['scheduled_at']
@@ -149,20 +317,38 @@ def update_post(                                                # you are here
         
         post.scheduled_at = scheduled_at
         post.status = PostStatus.SCHEDULED
+        # A new schedule starts a fresh round of publish attempts
+        post.publish_attempts = 0
+        post.next_attempt_at = None
+        post.last_publish_error = None
+        # A publish already in flight keeps its call but no longer records an outcome
+        post.claimed_by = None
+        post.claimed_until = None
 
     for field, value in update_data.items():
         setattr(post, field, value)
     
-    db.commit()
-    db.refresh(post)
+    if post.status != old_status:
+        new_status = post.status
+        # post_analytics before user_analytics_rollup, the order every analytics writer locks them in
+        await db.run_sync(lambda session: sync_analytics_status([post.id], new_status, session))
+        await db.run_sync(lambda session: apply_rollup_delta(post.user_id, status_change_delta(old_status, new_status), session))
+    
+    if post.status == PostStatus.SCHEDULED and post.scheduled_at:
+        scheduled_at = post.scheduled_at
+        await db.run_sync(lambda session: notify_post_scheduled(post.id, scheduled_at, session))
+    
+    await db.commit()
+    invalidate_analytics_cache([post.user_id], [post.id])
+    await db.refresh(post)
     
     return post
 
 @router.delete('/{post_id}')
-def delete_post(
+async def delete_post(
     post_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Validate UUID format
     try:
@@ -170,8 +356,10 @@ def delete_post(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid post ID format")
     
-    # Get the post
-    post = db.query(Post).filter(Post.id == post_uuid).first()
+    # Get the post, locked
+    post = await db.scalar(
+        select(Post).options(joinedload(Post.analytics)).where(Post.id == post_uuid).with_for_update(of=Post)
+    )
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -179,7 +367,19 @@ def delete_post(
     if current_user.role != UserRole.ADMIN and post.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this post")
     
-    db.delete(post)
-    db.commit()
+    # Lock the analytics row (before the rollup, like every analytics writer) and re-read its counters,
+    # so increments committed since the load above are subtracted too
+    await db.scalar(
+        select(PostAnalytics).where(PostAnalytics.post_id == post.id).with_for_update().execution_options(populate_existing=True)
+    )
+    deltas = status_change_delta(post.status, None)
+    if post.analytics:
+        for field in ANALYTICS_COUNTERS:
+            deltas[field] = -(getattr(post.analytics, field) or 0)
+    await db.run_sync(lambda session: apply_rollup_delta(post.user_id, deltas, session))
+    
+    await db.delete(post)
+    await db.commit()
+    invalidate_analytics_cache([post.user_id], [post_uuid])
     
     return {"detail": "Post deleted successfully"}
\ No newline at end of file
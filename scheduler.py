@@ -1,29 +1,377 @@
 # scheduler.py
+import asyncio
+import heapq
+import json
+import math
+import os
+import random
+import select
+import socket
+import threading
 import time
-from database import get_db, Post, PostStatus
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from database import get_db, SessionLocal, engine, Post, PostStatus
+from publisher import get_publisher
+from sqlalchemy import func, or_, update
 from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+from utils import (
+    apply_rollup_deltas,
+    status_change_delta,
+    sync_analytics_status,
+    invalidate_analytics_cache,
+    sweep_refresh_tokens,
+    SCHEDULE_CHANNEL
+)
+from datetime import datetime, timedelta, timezone
 
-def find_and_publish_posts():
-    db: Session = next(get_db())  # Get a database session outside of a FastAPI dependency
+PUBLISH_BATCH_SIZE = int(os.getenv('SCHEDULER_BATCH_SIZE', '100'))
+# Wall-clock interval of the periodic catch-up (publishes anything missed and re-reads the schedule);
+# bounds the delay a missed notification can cause
+MAX_SLEEP_SECONDS = float(os.getenv('SCHEDULER_MAX_SLEEP_SECONDS', '60'))
+# Backoff between attempts to reopen the listener connection after a database error
+RECONNECT_BASE_SECONDS = float(os.getenv('SCHEDULER_RECONNECT_BASE_SECONDS', '1'))
+RECONNECT_MAX_SECONDS = float(os.getenv('SCHEDULER_RECONNECT_MAX_SECONDS', '60'))
+# How many upcoming posts are kept in memory; the heap is re-read from the DB after every publish round
+PRELOAD_LIMIT = int(os.getenv('SCHEDULER_PRELOAD_LIMIT', '1000'))
+METRICS_PORT = int(os.getenv('SCHEDULER_METRICS_PORT', '0'))
+# Publishing: calls in flight per batch, per-call timeout, and retry policy for failed calls
+PUBLISH_CONCURRENCY = int(os.getenv('SCHEDULER_PUBLISH_CONCURRENCY', '10'))
+PUBLISH_TIMEOUT_SECONDS = float(os.getenv('SCHEDULER_PUBLISH_TIMEOUT_SECONDS', '30'))
+MAX_PUBLISH_ATTEMPTS = int(os.getenv('SCHEDULER_MAX_PUBLISH_ATTEMPTS', '5'))
+RETRY_BASE_SECONDS = float(os.getenv('SCHEDULER_RETRY_BASE_SECONDS', '30'))
+RETRY_MAX_SECONDS = float(os.getenv('SCHEDULER_RETRY_MAX_SECONDS', '3600'))
+# How long a claimed batch stays reserved for its worker; by default the longest a batch can take
+# to publish plus a minute. Claims of a worker that died are picked up again once they expire
+CLAIM_LEASE_SECONDS = float(os.getenv(
+    'SCHEDULER_CLAIM_LEASE_SECONDS',
+    str(PUBLISH_TIMEOUT_SECONDS * math.ceil(PUBLISH_BATCH_SIZE / PUBLISH_CONCURRENCY) + 60)
+))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+# Expired refresh tokens are deleted on this interval by a background thread; 0 disables it
+TOKEN_SWEEP_SECONDS = float(os.getenv('REFRESH_TOKEN_SWEEP_SECONDS', '3600'))
+
+publisher = get_publisher()
+
+publish_metrics = {
+    "published": 0,
+    "batches": 0,
+    "errors": 0,
+    "retries": 0,
+    "failed": 0,
+    "last_lag_seconds": 0.0,
+    "max_lag_seconds": 0.0,
+    "avg_lag_seconds": 0.0,
+}
+
+def record_publish_lag(lags: list):
+    if not lags:
+        return
+    total_lag = publish_metrics["avg_lag_seconds"] * publish_metrics["published"] + sum(lags)
+    publish_metrics["published"] += len(lags)
+    publish_metrics["batches"] += 1
+    publish_metrics["last_lag_seconds"] = round(lags[-1], 3)
+    publish_metrics["max_lag_seconds"] = round(max(publish_metrics["max_lag_seconds"], *lags), 3)
+    publish_metrics["avg_lag_seconds"] = round(total_lag / publish_metrics["published"], 3)
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with full jitter, capped at RETRY_MAX_SECONDS."""
+
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+async def publish_all(posts: list) -> list:
+    """Publish posts concurrently; returns None or the error for each post, in order."""
+
+    semaphore = asyncio.Semaphore(PUBLISH_CONCURRENCY)
+
+    async def publish_one(post):
+        async with semaphore:
+            try:
+                await asyncio.wait_for(publisher.publish(post), PUBLISH_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                return f"Timed out after {PUBLISH_TIMEOUT_SECONDS:g}s"
+            except Exception as e:
+                return str(e) or type(e).__name__
+            return None
+
+    return await asyncio.gather(*(publish_one(post) for post in posts))
+
+def due_posts_query(db: Session, current_time: datetime, skipped: set = frozenset()):
+    """Claim query for the next batch of due posts that are unclaimed or whose claim has expired."""
+
+    query = db.query(Post).filter(
+        Post.status == PostStatus.SCHEDULED,
+        Post.scheduled_at <= current_time,
+        or_(Post.next_attempt_at.is_(None), Post.next_attempt_at <= current_time),
+        or_(Post.claimed_until.is_(None), Post.claimed_until <= current_time)
+    )
+    if skipped:
+        query = query.filter(Post.id.not_in(skipped))
+    # Rows another scheduler is claiming right now are skipped; the locks only last for the claim
+    # transaction. FOR NO KEY UPDATE is enough since the id is never changed, and unlike FOR UPDATE
+    # it does not block the FK checks of concurrent inserts that reference these posts
+    return query.order_by(Post.scheduled_at).limit(PUBLISH_BATCH_SIZE).with_for_update(
+        skip_locked=True, key_share=True, of=Post
+    )
+
+def upcoming_schedule_query(db: Session, current_time: datetime):
+    """(due_at, post_id) of the next PRELOAD_LIMIT scheduled posts due after current_time, retries included."""
+
+    due_at = func.coalesce(Post.next_attempt_at, Post.scheduled_at)
+    return db.query(due_at, Post.id).filter(
+        Post.status == PostStatus.SCHEDULED,
+        due_at > current_time
+    ).order_by(due_at).limit(PRELOAD_LIMIT)
+
+def claim_due_posts(db: Session, skipped: set) -> list:
+    """Lease the next batch of due posts to this worker and commit; returns the claimed posts."""
+
+    current_time = datetime.now(timezone.utc)
+    posts = due_posts_query(db, current_time, skipped).all()
+    if posts:
+        db.execute(
+            update(Post).where(Post.id.in_([post.id for post in posts])).values(
+                claimed_by=WORKER_ID,
+                claimed_until=current_time + timedelta(seconds=CLAIM_LEASE_SECONDS)
+            )
+        )
+    db.commit()
+    return posts
+
+def publish_batch(db: Session, skipped: set, retry_times: list) -> int:
+    """Publish up to PUBLISH_BATCH_SIZE due posts and commit the outcomes; returns the batch size.
+
+    The batch is claimed in one short transaction, published with no transaction open, and the
+    outcomes are committed in a second one. Failed calls are rescheduled with backoff (their due
+    times are appended to retry_times) and the post is marked FAILED once MAX_PUBLISH_ATTEMPTS is reached.
+    """
+
+    claimed = claim_due_posts(db, skipped)
+    if not claimed:
+        return 0
+
+    errors = asyncio.run(publish_all(claimed))
+    finished_at = datetime.now(timezone.utc)
+
+    # Lock the posts this worker still holds. A post whose claim expired and was taken by another
+    # worker, or that was rescheduled, deleted or unscheduled meanwhile, keeps its new state
+    held = {post.id for post in db.query(Post).filter(
+        Post.id.in_([post.id for post in claimed]),
+        Post.claimed_by == WORKER_ID,
+        Post.status == PostStatus.SCHEDULED
+    ).order_by(Post.id).with_for_update(key_share=True).populate_existing()}
+    results = []
+    for post, error in zip(claimed, errors):
+        if post.id in held:
+            results.append((post, error))
+        else:
+            publish_metrics["errors"] += 1
+            print(f"Claim on post {post.id} was lost while publishing, leaving it as it is")
+
+    outcomes = {PostStatus.PUBLISHED: [], PostStatus.FAILED: []}
+    rollup_deltas = {}
+    for post, error in results:
+        try:
+            # Savepoint per post: a bad row is skipped instead of rolling back the batch
+            with db.begin_nested():
+                post.publish_attempts += 1
+                post.claimed_by = None
+                post.claimed_until = None
+                if error is None:
+                    post.status = PostStatus.PUBLISHED
+                    post.published_at = finished_at
+                    post.next_attempt_at = None
+                    post.last_publish_error = None
+                else:
+                    print(f"Publish attempt {post.publish_attempts} failed for post {post.id}: {error}")
+                    post.last_publish_error = error
+                    if post.publish_attempts >= MAX_PUBLISH_ATTEMPTS:
+                        post.status = PostStatus.FAILED
+                        post.next_attempt_at = None
+                    else:
+                        post.next_attempt_at = finished_at + retry_delay(post.publish_attempts)
+                db.flush()
+        except Exception as e:
+            skipped.add(post.id)
+            publish_metrics["errors"] += 1
+            print(f"Error publishing post {post.id}: {e}")
+            continue
+        if post.status == PostStatus.SCHEDULED:
+            publish_metrics["retries"] += 1
+            retry_times.append((post.next_attempt_at, post.id))
+            continue
+        outcomes[post.status].append(post)
+        rollup_deltas.setdefault(post.user_id, Counter()).update(
+            status_change_delta(PostStatus.SCHEDULED, post.status)
+        )
+
+    # post_analytics before user_analytics_rollup, the order every analytics writer locks them in
+    for status, posts in outcomes.items():
+        sync_analytics_status([post.id for post in posts], status, db)
+    apply_rollup_deltas(rollup_deltas, db)
+    db.commit()
+    invalidate_analytics_cache(rollup_deltas, [post.id for posts in outcomes.values() for post in posts])
+
+    publish_metrics["failed"] += len(outcomes[PostStatus.FAILED])
+    record_publish_lag([(post.published_at - post.scheduled_at).total_seconds() for post in outcomes[PostStatus.PUBLISHED]])
+    return len(claimed)
+
+def find_and_publish_posts() -> list:
+    """Publish everything that is due; returns (next_attempt_at, post_id) for posts awaiting a retry."""
+
+    # Claimed posts are published after the claim commits, so keep them loaded across commits
+    db: Session = SessionLocal(expire_on_commit=False)
+    retry_times = []
     try:
-        current_time = datetime.now(timezone.utc)
-        results = db.query(Post).filter(Post.status == PostStatus.SCHEDULED, Post.scheduled_at <= current_time).all()
-        for post in results:
-            print(f"Publishing post: {post.id} with title: {post.title}")
-            # Simulate the LinkedIn API call
-            # This would be an empty function
-            post.status = PostStatus.PUBLISHED
-            post.published_at = current_time
-        db.commit()
+        published_before = publish_metrics["published"]
+        skipped = set()
+        while publish_batch(db, skipped, retry_times) == PUBLISH_BATCH_SIZE:
+            pass
+        if publish_metrics["published"] != published_before:
+            print(f"Publish metrics: {publish_metrics}")
     except Exception as e:
         db.rollback()
         print(f"Error updating scheduled posts: {e}")
     finally:
         db.close()
+    return retry_times
 
-if __name__ == "__main__":
+def load_schedule() -> list:
+    """Heap of (due_at, post_id) for the next PRELOAD_LIMIT posts due in the future, retries included."""
+
+    db: Session = next(get_db())
+    try:
+        rows = upcoming_schedule_query(db, datetime.now(timezone.utc)).all()
+        heap = [(due, post_id) for due, post_id in rows]
+        heapq.heapify(heap)
+        return heap
+    finally:
+        db.close()
+
+def listen_for_schedule_changes():
+    """Dedicated autocommit connection subscribed to schedule notifications (needs a direct, non-PgBouncer connection)."""
+
+    connection = engine.raw_connection()
+    connection.detach()  # Autocommit must not leak back into the pool
+    listener = connection.dbapi_connection
+    listener.rollback()
+    listener.autocommit = True
+    with listener.cursor() as cursor:
+        cursor.execute(f"LISTEN {SCHEDULE_CHANNEL}")
+    return connection
+
+def drain_notifications(connection, heap: list):
+    listener = connection.dbapi_connection
+    listener.poll()
+    while listener.notifies:
+        notification = listener.notifies.pop(0)
+        post_id, scheduled_at = notification.payload.split("|")
+        heapq.heappush(heap, (datetime.fromisoformat(scheduled_at), uuid.UUID(post_id)))
+
+def close_listener(connection):
+    # Close the driver connection directly: it is detached from the pool, so there is nothing to reset
+    try:
+        connection.dbapi_connection.close()
+    except Exception as e:
+        print(f"Error closing schedule listener: {e}")
+
+def connect_and_catch_up():
+    """LISTEN, then publish whatever is due and load the schedule; retried with backoff until the database is back.
+
+    Returns (connection, heap). LISTEN comes first so no notification is lost during the catch-up.
+    """
+
+    attempts = 0
     while True:
-        print(f"Scheduler running at {datetime.now(timezone.utc)}")
-        find_and_publish_posts()
-        time.sleep(60)  # Sleep for 60 seconds
\ No newline at end of file
+        connection = None
+        try:
+            connection = listen_for_schedule_changes()
+            find_and_publish_posts()
+            return connection, load_schedule()  # Also picks up the retries from the catch-up
+        except Exception as e:
+            if connection is not None:
+                close_listener(connection)
+            attempts += 1
+            delay = min(RECONNECT_BASE_SECONDS * 2 ** (attempts - 1), RECONNECT_MAX_SECONDS)
+            print(f"Error connecting scheduler to the database: {e}; retrying in {delay:g}s")
+            time.sleep(delay)
+
+def sweep_tokens_forever():
+    while True:
+        db: Session = next(get_db())
+        try:
+            deleted = sweep_refresh_tokens(db)
+            if deleted:
+                print(f"Swept {deleted} expired refresh tokens")
+        except Exception as e:
+            db.rollback()
+            print(f"Error sweeping refresh tokens: {e}")
+        finally:
+            db.close()
+        time.sleep(TOKEN_SWEEP_SECONDS)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps(publish_metrics).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def run_scheduler():
+    if METRICS_PORT:
+        server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Publish metrics served on port {METRICS_PORT}")
+
+    if TOKEN_SWEEP_SECONDS:
+        threading.Thread(target=sweep_tokens_forever, name="token-sweeper", daemon=True).start()
+
+    connection, heap = connect_and_catch_up()  # Catch up on anything that came due while we were down
+    next_catch_up = time.monotonic() + MAX_SLEEP_SECONDS
+
+    while True:
+        try:
+            now = datetime.now(timezone.utc)
+            if heap and heap[0][0] <= now:
+                # Entries may be stale (rescheduled or deleted posts); the DB query decides what is due
+                while heap and heap[0][0] <= now:
+                    heapq.heappop(heap)
+                retry_times = find_and_publish_posts()
+                # Re-read the heap rather than only patching it, so a post scheduled ahead of it whose
+                # notification was missed is picked up too. Retries are pushed as well, since those
+                # that came due during the round are already past the reload's window
+                heap = load_schedule()
+                for entry in retry_times:
+                    heapq.heappush(heap, entry)
+                continue
+
+            if time.monotonic() >= next_catch_up:
+                # Periodic catch-up: retries skipped posts and recovers from missed notifications
+                find_and_publish_posts()
+                heap = load_schedule()
+                next_catch_up = time.monotonic() + MAX_SLEEP_SECONDS
+                continue
+
+            timeout = next_catch_up - time.monotonic()
+            if heap:
+                timeout = min((heap[0][0] - now).total_seconds(), timeout)
+            readable, _, _ = select.select([connection.dbapi_connection], [], [], max(timeout, 0))
+            if readable:
+                drain_notifications(connection, heap)
+        except Exception as e:
+            # Usually a dropped connection: reopen the listener and catch up on what was missed meanwhile
+            print(f"Scheduler error: {e}; reconnecting")
+            close_listener(connection)
+            connection, heap = connect_and_catch_up()
+            next_catch_up = time.monotonic() + MAX_SLEEP_SECONDS
+
+if __name__ == "__main__":
+    print(f"Scheduler running at {datetime.now(timezone.utc)}")
+    run_scheduler()
@@ -0,0 +1,166 @@
+import hashlib
+import math
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from database import SessionLocal, RefreshToken
+
+# How often each process pulls revocations made by other processes; a token revoked
+# elsewhere can still refresh here for up to this long
+SYNC_INTERVAL_SECONDS = float(os.getenv('TOKEN_DENYLIST_SYNC_SECONDS', '5'))
+# Expected revoked, unexpired tokens; the filter is rebuilt larger when this is exceeded
+BLOOM_CAPACITY = int(os.getenv('TOKEN_DENYLIST_BLOOM_CAPACITY', '100000'))
+BLOOM_ERROR_RATE = float(os.getenv('TOKEN_DENYLIST_BLOOM_ERROR_RATE', '0.001'))
+# Each sync re-reads this far behind the last revoked_at seen, for revocations whose
+# transaction started earlier but committed after the previous sync
+SYNC_OVERLAP = timedelta(seconds=60)
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings (k probes by double hashing one blake2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class TokenDenylist:
+    """Revoked refresh token jtis, so refreshes are verified from the JWT alone.
+
+    Lookups go through a bloom filter first: unrevoked tokens, nearly all of them, are answered
+    from a few bit probes, and only filter hits consult the exact set (jti -> expiry). Entries
+    are dropped once their token has expired, since the JWT exp check rejects it anyway.
+    The list is rebuilt from refresh_tokens.revoked_at at startup and then synced incrementally.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001, sync_interval: float = 5.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._revoked = {}  # jti -> expires_at
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._watermark = None  # Latest revoked_at seen in the database
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.lookups = 0
+        self.bloom_hits = 0
+        self.syncs = 0
+        self.sync_errors = 0
+
+    def start(self):
+        self.load()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="token-denylist", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def load(self):
+        """Rebuild from every revoked token that has not expired yet."""
+
+        with self._lock:
+            self._revoked.clear()
+            self._watermark = None
+        self.sync()
+
+    def sync(self):
+        """Pull revocations recorded since the last sync and drop expired entries."""
+
+        started = datetime.now(timezone.utc)
+        query = select(RefreshToken.jti, RefreshToken.expires_at, RefreshToken.revoked_at).where(
+            RefreshToken.revoked_at.is_not(None),
+            RefreshToken.expires_at > started
+        )
+        if self._watermark:
+            query = query.where(RefreshToken.revoked_at > self._watermark - SYNC_OVERLAP)
+        db = SessionLocal()
+        try:
+            rows = db.execute(query).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            for jti, expires_at, revoked_at in rows:
+                self._add(jti, expires_at)
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+            self._watermark = self._watermark or started
+            self._prune()
+            self.syncs += 1
+
+    def revoke(self, jti: str, expires_at: datetime):
+        """Record a revocation this process just committed, ahead of the next sync."""
+
+        with self._lock:
+            self._add(jti, expires_at)
+
+    def is_revoked(self, jti: str) -> bool:
+        self.lookups += 1
+        if jti not in self._bloom:
+            return False
+        self.bloom_hits += 1
+        with self._lock:
+            return jti in self._revoked
+
+    def _add(self, jti: str, expires_at: datetime):
+        self._revoked[jti] = expires_at
+        if len(self._revoked) > self._bloom.capacity:
+            self._rebuild(len(self._revoked) * 2)
+        else:
+            self._bloom.add(jti)
+
+    def _prune(self):
+        now = datetime.now(timezone.utc)
+        expired = [jti for jti, expires_at in self._revoked.items() if expires_at and expires_at <= now]
+        for jti in expired:
+            del self._revoked[jti]
+        if expired:
+            # Bloom filters can't delete, so start a fresh one without the expired jtis
+            self._rebuild(max(self.capacity, len(self._revoked) * 2))
+
+    def _rebuild(self, capacity: int):
+        bloom = BloomFilter(capacity, self.error_rate)
+        for jti in self._revoked:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def _run(self):
+        while not self._stopping.wait(self.sync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                self.sync_errors += 1
+                print(f"Error syncing token denylist: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            revoked = len(self._revoked)
+            bloom_capacity = self._bloom.capacity
+        return {
+            "revoked": revoked,
+            "bloom_capacity": bloom_capacity,
+            "lookups": self.lookups,
+            "bloom_hits": self.bloom_hits,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors
+        }
+
+token_denylist = TokenDenylist(BLOOM_CAPACITY, BLOOM_ERROR_RATE, SYNC_INTERVAL_SECONDS)
@@ -4,15 +4,36 @@ import os
 from datetime import timedelta, datetime, timezone
 from jose import jwt, JWTError
 import uuid
-from fastapi import HTTPException, Depends
+import base64
+import hashlib
+import re
+from collections import Counter
+from email.utils import format_datetime, parsedate_to_datetime
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, Depends, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from database import get_db, User, RefreshToken
-from database import PostAnalytics
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import get_async_db, User, UserRole, RefreshToken
+from database import Post, PostAnalytics, PostAnalyticsDaily, PostStatus
+from database import UserAnalyticsRollup, ROLLUP_STATUS_COLUMNS
+from sqlalchemy import func, event, select, insert, update, delete, literal, inspect, ARRAY, Text
+from dataclasses import dataclass
+from cache import TTLCache, MemoryCacheBackend, RedisCacheBackend, ResponseCache
+from token_denylist import token_denylist
 
 # PASSWORD HASHING
 
-pwd_context = CryptContext(schemes=['bcrypt'])
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', '64'))
+
+# Hashes made with a different work factor are flagged by needs_update/verify_and_update
+pwd_context = CryptContext(schemes=['bcrypt'], bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -20,6 +41,35 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
+def verify_and_update_password(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """Verify a password and return a new hash when the stored one uses an outdated work factor."""
+    return pwd_context.verify_and_update(plain, hashed)
+
+# bcrypt releases the GIL, so a dedicated thread pool hashes in parallel without
+# competing with the request threadpool
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+password_jobs = {"in_flight": 0, "rejected": 0}
+
+async def run_password_job(func, *args):
+    """Run a hashing function on the password executor, failing fast with 503 when saturated."""
+
+    if password_jobs["in_flight"] >= PASSWORD_HASH_QUEUE_LIMIT:
+        password_jobs["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+    password_jobs["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        password_jobs["in_flight"] -= 1
+
+def password_hash_stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+        **password_jobs
+    }
+
 # JWT ACCESS/REFRESH TOKEN GENERATION
 
 load_dotenv()
@@ -27,25 +77,154 @@ load_dotenv()
 JWT_ACCESS_SECRET = os.getenv('JWT_ACCESS_SECRET')
 JWT_REFRESH_SECRET = os.getenv('JWT_REFRESH_SECRET')
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM')
+REFRESH_TOKEN_TTL_DAYS = int(os.getenv('REFRESH_TOKEN_TTL_DAYS', '7'))
 
-def generate_access_token(data: dict, expiry_delta: timedelta):
+def generate_access_token(data: dict, expiry_delta: timedelta = None):
     payload = data.copy()
     expiry = datetime.now(timezone.utc) + (expiry_delta or timedelta(minutes=15))
     payload.update({"exp": expiry, "type": "access"})
     return jwt.encode(payload, JWT_ACCESS_SECRET, algorithm=JWT_ALGORITHM)
 
-def generate_refresh_token(data: dict, expiry_delta: timedelta):
+def generate_refresh_token(data: dict, expiry_delta: timedelta = None):
+    """Returns (token, jti, expiry); store the expiry with the jti so it is enforced server side too."""
     jti = str(uuid.uuid4())
     payload = data.copy()
-    expiry = datetime.now(timezone.utc) + (expiry_delta or timedelta(days=7))
+    expiry = datetime.now(timezone.utc) + (expiry_delta or timedelta(days=REFRESH_TOKEN_TTL_DAYS))
     payload.update({"exp": expiry, "jti": jti, "type": "refresh"})
-    return jwt.encode(payload, JWT_REFRESH_SECRET, algorithm=JWT_ALGORITHM), jti
+    return jwt.encode(payload, JWT_REFRESH_SECRET, algorithm=JWT_ALGORITHM), jti, expiry
+
+# AUTHENTICATED USER CACHE
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Detached snapshot of the User columns that request handlers read."""
+    id: uuid.UUID
+    name: str
+    email: str
+    role: UserRole
+
+# Keyed by token subject (email); invalidation is per process, other workers rely on the TTL
+user_cache = TTLCache(
+    max_size=int(os.getenv('USER_CACHE_MAX_SIZE', '10000')),
+    ttl=float(os.getenv('USER_CACHE_TTL_SECONDS', '60'))
+)
+
+def invalidate_cached_user(email: str):
+    user_cache.delete(email)
+
+# Changed users are evicted once their transaction commits. Evicting at flush would let a concurrent
+# request cache the old row again before the commit lands, and a rollback would still evict
+def _pending_user_invalidations(target) -> set:
+    return inspect(target).session.info.setdefault('invalidated_user_emails', set())
+
+@event.listens_for(User, 'before_update')
+def _invalidate_previous_email(mapper, connection, target):
+    # Entries are keyed by email, so also drop the one stored under the pre-update value
+    for previous_email in inspect(target).attrs.email.history.deleted:
+        if previous_email:
+            _pending_user_invalidations(target).add(previous_email)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user_on_change(mapper, connection, target):
+    _pending_user_invalidations(target).add(target.email)
+
+@event.listens_for(Session, 'after_commit')
+def _evict_committed_users(session):
+    for email in session.info.pop('invalidated_user_emails', ()):
+        invalidate_cached_user(email)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_users(session):
+    session.info.pop('invalidated_user_emails', None)
+
+# ANALYTICS RESPONSE CACHE
+
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '30'))
+
+def _response_cache_backend():
+    # The in-memory backend only sees invalidations from its own process (not from the
+    # scheduler or other workers, which fall back on the TTL); Redis shares them
+    if os.getenv('RESPONSE_CACHE_BACKEND', 'memory') == 'redis':
+        import redis
+        return RedisCacheBackend(redis.Redis.from_url(os.getenv('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')))
+    return MemoryCacheBackend(
+        max_size=int(os.getenv('RESPONSE_CACHE_MAX_SIZE', '10000')),
+        ttl=RESPONSE_CACHE_TTL_SECONDS
+    )
+
+response_cache = ResponseCache(_response_cache_backend(), ttl=RESPONSE_CACHE_TTL_SECONDS)
+
+ALL_POSTS_TAG = "all"
+
+def user_cache_tag(user_id: uuid.UUID) -> str:
+    return f"user:{user_id}"
+
+def post_cache_tag(post_id: uuid.UUID) -> str:
+    return f"post:{post_id}"
+
+def invalidate_analytics_cache(user_ids=(), post_ids=()):
+    """Drop cached analytics responses for these owners and posts (call after the commit)."""
+
+    tags = [user_cache_tag(user_id) for user_id in set(user_ids)]
+    tags += [post_cache_tag(post_id) for post_id in set(post_ids)]
+    if tags:
+        response_cache.invalidate(tags + [ALL_POSTS_TAG])
+
+def cached_json_response(request: Request, body: bytes) -> Response:
+    """JSON response with a content ETag; answers 304 when the client already has this body."""
+
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# CONDITIONAL REQUESTS
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # If-None-Match uses weak comparison, so a W/ prefix doesn't matter
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+def resource_etag(resource_id: uuid.UUID, updated_at: datetime | None) -> str:
+    version = updated_at.timestamp() if updated_at else 0
+    return f'"{resource_id}-{version:.6f}"'
+
+def validator_headers(etag: str, updated_at: datetime | None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if updated_at:
+        headers["Last-Modified"] = format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, etag: str, updated_at: datetime | None) -> bool:
+    """True when the client's copy is current: If-None-Match wins, otherwise If-Modified-Since."""
+
+    if request.headers.get("if-none-match"):
+        return etag_matches(request, etag)
+    header = request.headers.get("if-modified-since")
+    if not header or not updated_at:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have second precision
+    return updated_at.replace(microsecond=0) <= since
+
+def has_validators(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
 
 # JWT ACCESS/REFRESH FUNCTIONS
 
 security = HTTPBearer()
 
-def get_current_user(access_token: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+async def get_current_user(access_token: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_async_db)):
 
     try:
         payload = jwt.decode(access_token.credentials, JWT_ACCESS_SECRET, algorithms=[JWT_ALGORITHM])
@@ -56,15 +235,27 @@ def get_current_user(access_token: HTTPAuthorizationCredentials = Depends(securi
         if not email:
             raise HTTPException(status_code=401, detail="sub claim missing from token")
         
-        user = db.query(User).filter(User.email == email).first()
-        if not user:
+        user = user_cache.get(email)
+        if user:
+            return user
+        
+        stored_user = await db.scalar(select(User).where(User.email == email))
+        if not stored_user:
             raise HTTPException(status_code=401, detail="User data missing")
         
+        user = AuthenticatedUser(
+            id=stored_user.id,
+            name=stored_user.name,
+            email=stored_user.email,
+            role=stored_user.role
+        )
+        user_cache.set(email, user)
         return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Authorization failed")
     
-def refresh_access_token(refresh_token_str: str, db: Session):
+def refresh_access_token(refresh_token_str: str):
+    """New access token for a valid refresh token; signature, expiry and the revocation denylist are all checked in memory."""
 
     try:
         payload = jwt.decode(refresh_token_str, JWT_REFRESH_SECRET, algorithms=[JWT_ALGORITHM])
@@ -75,25 +266,22 @@ def refresh_access_token(refresh_token_str: str, db: Session):
         if not jti:
             raise HTTPException(status_code=401, detail="jti claim missing from token")
         
-        stored_token = db.query(RefreshToken).filter(RefreshToken.jti == jti).first()
-        if not stored_token or not stored_token.is_active:
-            raise HTTPException(status_code=401, detail="Invalid or missing refresh token")
+        if token_denylist.is_revoked(jti):
+            raise HTTPException(status_code=401, detail="Refresh token revoked")
         
         email = payload.get("sub") # email from payload
         if not email:
             raise HTTPException(status_code=401, detail="sub claim missing from token")
-        user = db.query(User).filter(User.email == email).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="User data missing")
         
-        new_access_token = generate_access_token({"sub": user.email}) # email from db
+        # A deleted user is caught by get_current_user when the access token is used
+        new_access_token = generate_access_token({"sub": email})
         return new_access_token
     except JWTError:
         raise HTTPException(status_code=401, detail="Token refresh failed")
     
 # LOGOUT FUNCTION (invalidates refresh token)
 
-def deactivate_refresh_token(refresh_token_str: str, db: Session):
+async def deactivate_refresh_token(refresh_token_str: str, db: AsyncSession):
 
     try:
         payload = jwt.decode(refresh_token_str, JWT_REFRESH_SECRET, algorithms=[JWT_ALGORITHM])
@@ -101,27 +289,279 @@ def deactivate_refresh_token(refresh_token_str: str, db: Session):
         if not jti:
             raise HTTPException(status_code=400, detail="jti claim missing in token")
 
-        stored_token = db.query(RefreshToken).filter(RefreshToken.jti == jti).first()
+        stored_token = await db.scalar(select(RefreshToken).where(RefreshToken.jti == jti))
         if not stored_token or not stored_token.is_active:
             raise HTTPException(status_code=400, detail="Refresh token already invalidated")
 
         stored_token.is_active = False
-        db.commit()
+        stored_token.revoked_at = func.now()
+        await db.commit()
+        token_denylist.revoke(jti, stored_token.expires_at)
         return True
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
     
+# REFRESH TOKEN LIFECYCLE
+
+# Active refresh tokens kept per user; logging in beyond it revokes the oldest sessions
+REFRESH_TOKEN_MAX_ACTIVE = int(os.getenv('REFRESH_TOKEN_MAX_ACTIVE', '10'))
+REFRESH_TOKEN_SWEEP_BATCH_SIZE = int(os.getenv('REFRESH_TOKEN_SWEEP_BATCH_SIZE', '1000'))
+
+def enforce_refresh_token_cap(user_id: uuid.UUID, db: Session) -> list:
+    """Revoke the user's active tokens beyond the newest REFRESH_TOKEN_MAX_ACTIVE (caller commits).
+
+    Returns (jti, expires_at) of the revoked tokens for the denylist, once committed.
+    """
+
+    # Concurrent logins for one user queue on the user row (FOR NO KEY UPDATE, which still lets the
+    # token inserts' FK checks through), so each one sees the tokens committed before it and the
+    # revocations never lock token rows in conflicting orders
+    db.execute(select(User.id).where(User.id == user_id).with_for_update(key_share=True))
+    excess = select(RefreshToken.id).where(
+        RefreshToken.user_id == user_id,
+        RefreshToken.is_active.is_(True),
+        RefreshToken.expires_at > func.now()
+    ).order_by(RefreshToken.created_at.desc(), RefreshToken.id.desc()).offset(REFRESH_TOKEN_MAX_ACTIVE)
+    return db.execute(
+        update(RefreshToken).where(RefreshToken.id.in_(excess.scalar_subquery())).values(
+            is_active=False, revoked_at=func.now()
+        ).returning(RefreshToken.jti, RefreshToken.expires_at),
+        execution_options={"synchronize_session": False}
+    ).all()
+
+def sweep_refresh_tokens(db: Session, batch_size: int = REFRESH_TOKEN_SWEEP_BATCH_SIZE) -> int:
+    """Delete expired refresh tokens, committing every batch_size rows; returns the number deleted.
+
+    Revoked tokens stay until they expire, so the denylist can be rebuilt from them at startup.
+    Short transactions keep row locks and WAL bursts small while logins keep writing to the table.
+    """
+
+    deleted = 0
+    while True:
+        batch = select(RefreshToken.id).where(
+            RefreshToken.expires_at <= func.now()
+        ).limit(batch_size).with_for_update(skip_locked=True)
+        result = db.execute(
+            delete(RefreshToken).where(RefreshToken.id.in_(batch.scalar_subquery())),
+            execution_options={"synchronize_session": False}
+        )
+        db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
 # ANALYTICS GENERATION FUNCTION
 
-def create_post_analytics(post_id: str, db: Session):
+def create_post_analytics(post_id: uuid.UUID, db: Session | AsyncSession, user_id: uuid.UUID = None, status: PostStatus = None):
+    """Add the post's analytics row to the session (caller commits)."""
+
+    analytics = PostAnalytics(post_id=post_id, user_id=user_id, status=status)
+    db.add(analytics)
+    return analytics
+
+def create_posts_with_analytics(rows: list, db: Session) -> list:
+    """Insert posts and their analytics rows with one multi-row INSERT each (caller commits).
+
+    rows are dicts of Post columns, all with the same keys; the new posts come back in the same order.
+    """
+
+    if not rows:
+        return []
+    posts = db.scalars(insert(Post).returning(Post, sort_by_parameter_order=True), rows).all()
+    db.execute(
+        insert(PostAnalytics),
+        [{'post_id': post.id, 'user_id': post.user_id, 'status': post.status} for post in posts]
+    )
+    return posts
+
+def sync_analytics_status(post_ids: list, status: PostStatus, db: Session):
+    """Copy a post status change onto post_analytics.status (caller commits)."""
+
+    if not post_ids:
+        return
+    db.query(PostAnalytics).filter(PostAnalytics.post_id.in_(post_ids)).update(
+        {PostAnalytics.status: status}, synchronize_session=False
+    )
+
+# SCHEDULER NOTIFICATIONS
+
+SCHEDULE_CHANNEL = 'post_schedule'
+
+def notify_post_scheduled(post_id: uuid.UUID, scheduled_at: datetime, db: Session):
+    """Wake the scheduler for this post; NOTIFY is delivered only once the caller commits."""
+    notify_posts_scheduled([(post_id, scheduled_at)], db)
+
+def notify_posts_scheduled(schedules: list, db: Session):
+    """One NOTIFY per (post_id, scheduled_at) pair, sent in a single statement."""
+    if not schedules:
+        return
+    payloads = [f"{post_id}|{scheduled_at.isoformat()}" for post_id, scheduled_at in schedules]
+    payload = func.unnest(literal(payloads, ARRAY(Text))).column_valued('payload')
+    db.execute(select(func.pg_notify(SCHEDULE_CHANNEL, payload)))
+
+# DAILY ANALYTICS HISTORY
+
+def record_daily_analytics_batch(deltas_by_post: dict, db: Session):
+    """Add per-post counter deltas to today's post_analytics_daily rows in one upsert (caller commits)."""
+
+    rows = {}
+    for post_id, deltas in deltas_by_post.items():
+        deltas = {field: value for field, value in deltas.items() if value}
+        if deltas:
+            rows[post_id] = deltas
+    if not rows:
+        return
+
+    # Multi-row VALUES need one column list; counters a post didn't change add 0
+    fields = sorted({field for deltas in rows.values() for field in deltas})
+    today = datetime.now(timezone.utc).date()
+    values = [
+        {'post_id': post_id, 'day': today, **{field: rows[post_id].get(field, 0) for field in fields}}
+        for post_id in sorted(rows)
+    ]
+    stmt = pg_insert(PostAnalyticsDaily).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PostAnalyticsDaily.post_id, PostAnalyticsDaily.day],
+        set_={field: getattr(PostAnalyticsDaily, field) + stmt.excluded[field] for field in fields}
+    )
+    db.execute(stmt)
+
+def record_daily_analytics(post_id: uuid.UUID, deltas: dict, db: Session):
+    """Add counter deltas to today's post_analytics_daily row (caller commits)."""
+
+    record_daily_analytics_batch({post_id: deltas}, db)
+
+# ANALYTICS ROLLUP FUNCTIONS
+
+def status_change_delta(old_status: PostStatus | None, new_status: PostStatus | None) -> dict:
+    """Rollup delta for a post moving between statuses (None means created/deleted)."""
+
+    delta = {}
+    if old_status is not None:
+        delta[ROLLUP_STATUS_COLUMNS[old_status]] = -1
+    if new_status is not None:
+        column = ROLLUP_STATUS_COLUMNS[new_status]
+        delta[column] = delta.get(column, 0) + 1
+    if old_status is None:
+        delta['total_posts'] = 1
+    if new_status is None:
+        delta['total_posts'] = -1
+    return delta
+
+def apply_rollup_deltas(deltas_by_user: dict, db: Session):
+    """Add per-user deltas to user_analytics_rollup (caller commits).
+
+    There is no global row: writers for different users never touch the same row, and admin
+    summaries sum the per-user rows instead.
+    """
+
+    rows = {}
+    fields = set()
+    for user_id, deltas in deltas_by_user.items():
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            continue
+        rows[user_id] = deltas
+        fields.update(deltas)
+    if not rows:
+        return
+
+    # Lock user rows in a stable order to avoid deadlocks
+    fields = sorted(fields)
+    values = [
+        {'user_id': user_id, **{field: rows[user_id].get(field, 0) for field in fields}}
+        for user_id in sorted(rows)
+    ]
+
+    stmt = pg_insert(UserAnalyticsRollup).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserAnalyticsRollup.user_id],
+        set_={
+            **{field: getattr(UserAnalyticsRollup, field) + stmt.excluded[field] for field in fields},
+            'updated_at': func.now()
+        }
+    )
+    db.execute(stmt)
+
+def apply_rollup_delta(user_id: uuid.UUID, deltas: dict, db: Session):
+    apply_rollup_deltas({user_id: deltas}, db)
+
+# POST LIST FILTERS
+
+def filter_posts(query, current_user, status: PostStatus | None = None, user_id: str | None = None,
+                 created_from: datetime | None = None, created_to: datetime | None = None):
+    """Filters shared by the post list and the export: visibility by role, then status, owner and created_at range [from, to)."""
+
+    if current_user.role != UserRole.ADMIN:
+        # Regular users can only see their own posts
+        query = query.where(Post.user_id == current_user.id)
+    elif user_id:
+        # Admin can filter by specific user_id
+        try:
+            user_uuid = uuid.UUID(user_id)
+            query = query.where(Post.user_id == user_uuid)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid user_id format")
+    
+    if status:
+        query = query.where(Post.status == status)
+    if created_from:
+        query = query.where(Post.created_at >= created_from)
+    if created_to:
+        query = query.where(Post.created_at < created_to)
+    return query
+
+# KEYSET PAGINATION CURSORS
+
+def encode_cursor(created_at: datetime, post_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{post_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
 
     try:
-        post_uuid = uuid.UUID(post_id)
-        analytics = PostAnalytics(post_id=post_uuid)
-        db.add(analytics)
-        db.commit()
-        db.refresh(analytics)
-        return analytics
-    except Exception as e:
-        db.rollback()
-        raise e
+        created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(post_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def encode_search_cursor(rank: float, created_at: datetime, post_id: uuid.UUID) -> str:
+    raw = f"{rank!r}|{created_at.isoformat()}|{post_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_search_cursor(cursor: str) -> tuple[float, datetime, uuid.UUID]:
+
+    try:
+        rank, created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return float(rank), datetime.fromisoformat(created_at), uuid.UUID(post_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# POST SEARCH
+
+SEARCH_TERM_PATTERN = re.compile(r"\w+")
+# ts_rank's default weights for the 'A' (title) and 'B' (content) parts of the search vector
+TITLE_TERM_WEIGHT = 1.0
+CONTENT_TERM_WEIGHT = 0.4
+
+def search_terms(text: str | None) -> list[str]:
+    return SEARCH_TERM_PATTERN.findall((text or "").lower())
+
+def rank_posts_in_memory(posts, q: str) -> list[tuple]:
+    """Fallback for databases without full-text search (SQLite test runs).
+
+    Returns (post, rank) for the posts containing every query term, ranked by weighted term
+    counts; unlike Postgres there is no stemming or stop word removal.
+    """
+
+    terms = set(search_terms(q))
+    if not terms:
+        return []
+    ranked = []
+    for post in posts:
+        title_counts = Counter(search_terms(post.title))
+        content_counts = Counter(search_terms(post.content))
+        if all(title_counts[term] or content_counts[term] for term in terms):
+            rank = sum(TITLE_TERM_WEIGHT * title_counts[term] + CONTENT_TERM_WEIGHT * content_counts[term] for term in terms)
+            ranked.append((post, rank))
+    return ranked